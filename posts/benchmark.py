@@ -0,0 +1,235 @@
+"""Seeded data, routes and statistics of the ``benchmark`` command.
+
+Every named route of ``posts.urls`` is described by a ``Route`` whose
+``target`` returns the url and POST data of one request. Targets of the
+routes that delete something create what they delete first, outside of
+the timed part. Anonymous pages get a new query string every request,
+so they measure the view and not the full-page cache; their ``cached``
+twin repeats one url. Routes with nothing to point at in the seeded
+data, no group or no other author with posts, are left out.
+"""
+import io
+import math
+import random
+from collections import namedtuple
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from .models import Comment, Follow, Group, Post, User, content_hash
+
+PASSWORD = 'benchmark-password'
+# SQLite limits a compound INSERT to 500 rows.
+BATCH_SIZE = 500
+
+Route = namedtuple('Route', 'name method auth target')
+Stats = namedtuple('Stats', 'count errors p50 p95 p99 queries bytes')
+
+
+def _avatar():
+    buffer = io.BytesIO()
+    Image.new('RGB', (200, 200), 'gray').save(buffer, 'JPEG')
+    return default_storage.save('users/benchmark.jpg',
+                                ContentFile(buffer.getvalue()))
+
+
+def seed(users, groups, posts, comments, follows, random_seed=0):
+    """Fill the database in bulk, then rebuild the derived tables."""
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    rnd = random.Random(random_seed)
+    avatar, password = _avatar(), make_password(PASSWORD)
+    User.objects.bulk_create(
+        [User(username=f'user{number}', email=f'user{number}@example.com',
+              password=password, avatar=avatar, about=fake.sentence())
+         for number in range(users)],
+        batch_size=BATCH_SIZE,
+    )
+    Group.objects.bulk_create(
+        [Group(title=f'Группа {number}', slug=f'group-{number}',
+               description=fake.sentence())
+         for number in range(groups)],
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True)) + [None]
+    for start in range(0, posts, BATCH_SIZE):
+        batch = []
+        for number in range(start, min(start + BATCH_SIZE, posts)):
+            text = f'{fake.text(max_nb_chars=400)} #{number}'
+            discription = fake.sentence()
+            batch.append(Post(
+                text=text, discription=discription,
+                author_id=rnd.choice(user_ids),
+                group_id=rnd.choice(group_ids),
+                content_hash=content_hash(text, discription),
+            ))
+        Post.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+    # auto_now_add gave every post the same date, spread them out.
+    now = timezone.now()
+    spread = list(Post.objects.only('pk'))
+    for number, post in enumerate(spread):
+        post.pub_date = now - timedelta(minutes=len(spread) - number)
+    Post.objects.bulk_update(spread, ['pub_date'], batch_size=BATCH_SIZE)
+    post_ids = [post.pk for post in spread]
+    Comment.objects.bulk_create(
+        [Comment(post_id=rnd.choice(post_ids), author_id=rnd.choice(user_ids),
+                 text=fake.sentence())
+         for _ in range(comments)],
+        batch_size=BATCH_SIZE,
+    )
+    pairs = {
+        tuple(rnd.sample(user_ids, 2))
+        for _ in range(follows)
+    } if len(user_ids) > 1 else set()
+    Follow.objects.bulk_create(
+        [Follow(user_id=user, author_id=author) for user, author in pairs],
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    for command in ('reconcile_comment_counts', 'rebuild_timelines',
+                    'reindex_search'):
+        call_command(command, stdout=io.StringIO())
+
+
+def routes(reader):
+    """Routes of ``posts.urls`` as seen by ``reader``, logged in or not."""
+    counter = iter(range(10 ** 9))
+    author = (
+        User.objects.exclude(pk=reader.pk).filter(posts__isnull=False)
+        .order_by('pk').first()
+    )
+    post = author and author.posts.order_by('-comments_count').first()
+    group = Group.objects.filter(posts__isnull=False).order_by('pk').first()
+    own = Post.objects.filter(author=reader).first() or Post.objects.create(
+        author=reader, text='benchmark post of the reader'
+    )
+    own_kwargs = {'username': reader.username, 'post_id': own.pk}
+
+    def get(name, **kwargs):
+        return lambda: (reverse(f'posts:{name}', kwargs=kwargs), None)
+
+    def new_post():
+        return reverse('posts:new_post'), {
+            'text': f'benchmark post {next(counter)}', 'discription': 'bench'
+        }
+
+    def post_edit():
+        return reverse('posts:post_edit', kwargs=own_kwargs), {
+            'text': f'edited benchmark post {next(counter)}'
+        }
+
+    def post_delete():
+        doomed = Post.objects.create(
+            author=reader, text=f'doomed benchmark post {next(counter)}'
+        )
+        return reverse('posts:post_delete', kwargs={
+            'username': reader.username, 'post_id': doomed.pk
+        }), None
+
+    # Concurrent requests must not follow or unfollow the same author.
+    others = list(User.objects.exclude(pk=reader.pk).order_by('pk'))
+
+    def follow(name):
+        def target():
+            other = others[next(counter) % len(others)]
+            if name == 'profile_unfollow':
+                Follow.objects.get_or_create(user=reader, author=other)
+            else:
+                Follow.objects.filter(user=reader, author=other).delete()
+            return reverse(f'posts:{name}',
+                           kwargs={'username': other.username}), None
+        return target
+
+    pages = [('index', get('index')),
+             ('index?page=20',
+              lambda: (reverse('posts:index') + '?page=20', None))]
+    if group is not None:
+        pages.append(('group_posts', get('group_posts', slug=group.slug)))
+    if post is not None:
+        post_kwargs = {'username': author.username, 'post_id': post.pk}
+        word = post.text.split()[0]
+        pages += [
+            ('profile', get('profile', username=author.username)),
+            ('post', get('post', **post_kwargs)),
+            ('search',
+             lambda: (f"{reverse('posts:search')}?{urlencode({'q': word})}",
+                      None)),
+        ]
+
+    def uncached(target):
+        def varied():
+            url, data = target()
+            separator = '&' if '?' in url else '?'
+            return f'{url}{separator}nocache={next(counter)}', data
+        return varied
+
+    found = []
+    for name, target in pages:
+        found.append(Route(name, 'GET', False, uncached(target)))
+        found.append(Route(f'{name} cached', 'GET', False, target))
+    found += [
+        Route('follow_index', 'GET', True, get('follow_index')),
+        Route('profile_edit', 'GET', True,
+              get('profile_edit', username=reader.username)),
+        Route('new_post', 'POST', True, new_post),
+        Route('post_edit', 'POST', True, post_edit),
+    ]
+    if post is not None:
+        def add_comment():
+            return reverse('posts:add_comment', kwargs=post_kwargs), {
+                'text': f'benchmark comment {next(counter)}'
+            }
+
+        def comment_url(name):
+            def target():
+                comment = Comment.objects.create(post=post, author=reader,
+                                                 text='benchmark comment')
+                url = reverse(f'posts:{name}', kwargs={
+                    **post_kwargs, 'comment_id': comment.pk
+                })
+                if name == 'edit_comment':
+                    return url, {'text': 'edited comment'}
+                return url, None
+            return target
+
+        found += [
+            Route('add_comment', 'POST', True, add_comment),
+            Route('edit_comment', 'POST', True, comment_url('edit_comment')),
+            Route('delete_comment', 'GET', True,
+                  comment_url('delete_comment')),
+        ]
+    found.append(Route('post_delete', 'GET', True, post_delete))
+    if others:
+        found += [
+            Route('profile_follow', 'GET', True, follow('profile_follow')),
+            Route('profile_unfollow', 'GET', True,
+                  follow('profile_unfollow')),
+        ]
+    return found
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+def summarize(timings, queries, sizes, errors):
+    """``Stats`` of one route, latencies in milliseconds."""
+    return Stats(
+        count=len(timings),
+        errors=errors,
+        p50=percentile(timings, 0.50) * 1000,
+        p95=percentile(timings, 0.95) * 1000,
+        p99=percentile(timings, 0.99) * 1000,
+        queries=sum(queries) / len(queries) if queries else None,
+        bytes=sum(sizes) / len(sizes),
+    )
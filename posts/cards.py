@@ -0,0 +1,92 @@
+"""Versioned fragment cache of post cards.
+
+A rendered card is stored under the id of its post plus the versions of
+the post, its group and its author. Writes bump the matching version, so
+stale cards are never read again and simply expire. The card is the same
+for every reader, the links only the author sees are spliced in on
+every render in place of ``OWNER_LINKS``.
+"""
+import time
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import images, metrics, thumbnails
+
+CARD_TEMPLATE = 'includes/post_card.html'
+OWNER_LINKS_TEMPLATE = 'includes/post_owner_links.html'
+OWNER_LINKS = '<!-- owner-links -->'
+TIMEOUT = 60 * 60 * 24
+# Cards showing a thumbnail placeholder are re-rendered soon.
+PENDING_TIMEOUT = 10
+
+
+def _version_key(kind, pk):
+    return f'posts:card_version:{kind}:{pk}'
+
+
+def bump(kind, pk):
+    """Invalidate every card that depends on the ``kind`` object ``pk``."""
+    cache.set(_version_key(kind, pk), time.time_ns(), None)
+
+
+def _versions(posts):
+    """``{post id: version tokens}`` of the cards of ``posts``, read with
+    one ``get_many``."""
+    keys = {}
+    for post in posts:
+        keys[post.pk] = [_version_key('post', post.pk),
+                         _version_key('author', post.author_id)]
+        if post.group_id:
+            keys[post.pk].append(_version_key('group', post.group_id))
+    found = cache.get_many({key for row in keys.values() for key in row})
+    for key in {key for row in keys.values() for key in row} - set(found):
+        found[key] = time.time_ns()
+        cache.add(key, found[key], None)
+        found[key] = cache.get(key, found[key])
+    return {pk: [str(found[key]) for key in row] for pk, row in keys.items()}
+
+
+def _key(post, versions):
+    return ':'.join(['posts:card', str(post.pk), *versions[post.pk]])
+
+
+def prefetch(posts):
+    """Read the cached cards of a whole page with one ``get_many`` and
+    load the images of the missing ones in bulk.
+
+    ``render`` then takes the card found for each post, rendering the
+    missing ones finds variants and thumbnails in the cache.
+    """
+    posts = list(posts)
+    versions = _versions(posts)
+    keys = {_key(post, versions): post for post in posts}
+    cached = cache.get_many(keys)
+    for key, post in keys.items():
+        post._card = (key, cached.get(key))
+    stale = [post for key, post in keys.items() if key not in cached]
+    if stale:
+        images.prefetch(post.image for post in stale)
+        thumbnails.prefetch(post.image.name for post in stale)
+
+
+def render(post, user):
+    if '_card' in post.__dict__:
+        key, card = post.__dict__.pop('_card')
+    else:
+        key = _key(post, _versions([post]))
+        card = cache.get(key)
+    metrics.inc('cache_requests_total', cache='card',
+                result='miss' if card is None else 'hit')
+    if card is None:
+        pending = thumbnails.pending_count()
+        card = render_to_string(CARD_TEMPLATE, {'post': post})
+        timeout = TIMEOUT
+        if thumbnails.pending_count() > pending:
+            timeout = PENDING_TIMEOUT
+        cache.set(key, card, timeout)
+    links = ''
+    if user is not None and user.pk == post.author_id:
+        links = render_to_string(OWNER_LINKS_TEMPLATE, {'post': post})
+    return mark_safe(card.replace(OWNER_LINKS, links, 1))
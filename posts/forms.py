@@ -2,7 +2,7 @@ from django import forms
 from django.forms import ModelForm
 from django.forms.widgets import Textarea
 
-from .models import Comment, Post, User
+from .models import Comment, Post, User, content_hash
 
 
 class PostForm(ModelForm):
@@ -19,10 +19,13 @@ class PostForm(ModelForm):
 
     def clean_text(self):
         post = self.cleaned_data['text']
-        about = self.cleaned_data['discription']
-        if Post.objects.filter(
-            text=post, discription=about,
-        ).exists():
+        about = self.cleaned_data.get('discription')
+        duplicates = Post.objects.scatter().filter(
+            content_hash=content_hash(post, about),
+        )
+        if self.instance.pk:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
             raise forms.ValidationError(
                 'Пост c таким содержанием, уже есть'
             )
@@ -0,0 +1,53 @@
+"""Cached list of groups for the sidebar.
+
+Holds only ``title``, ``slug`` and ``post_count`` of every group, so a
+request never loads group posts just to count them. The list lives in
+the tiered cache under a key versioned by ``SCOPE``; signals bump it
+when a group changes or a post may have moved between groups. With
+sharded posts the counts are summed over the shards.
+"""
+from collections import Counter
+
+from django.db.models import Count
+
+from . import page_cache, shards, tiered_cache
+from .models import Group, Post
+
+CACHE_KEY = 'posts:groups'
+SCOPE = 'groups'
+TIMEOUT = 60 * 60
+
+
+def load():
+    return tiered_cache.fetch(
+        page_cache.versioned_key(CACHE_KEY, SCOPE), _read, TIMEOUT
+    )
+
+
+def _read():
+    if shards.enabled():
+        return _sharded()
+    return list(
+        Group.objects.annotate(post_count=Count('posts'))
+        .order_by('title').values('title', 'slug', 'post_count')
+    )
+
+
+def _sharded():
+    counts = Counter()
+    rows = (
+        Post.objects.scatter().filter(group__isnull=False).order_by()
+        .values('group').annotate(total=Count('pk'))
+        .values_list('group', 'total')
+    )
+    for group_id, total in rows:
+        counts[group_id] += total
+    return [
+        {'title': title, 'slug': slug, 'post_count': counts[pk]}
+        for pk, title, slug in
+        Group.objects.order_by('title').values_list('pk', 'title', 'slug')
+    ]
+
+
+def invalidate():
+    page_cache.bump(SCOPE)
@@ -0,0 +1,155 @@
+"""Responsive variants of uploaded images.
+
+Every uploaded ``Post.image`` and ``User.avatar`` is resized on the image
+worker pool into several widths, in AVIF when Pillow can write it, WebP
+and JPEG. ``ImageVariant`` rows describe the files and the
+``responsive_image`` tag turns them into a ``<picture>`` with ``srcset``.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+
+from . import cards, page_cache, thumbnails
+from .models import ImageVariant, Post
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 960, 1280)
+# Best compression first, the browser takes the first type it supports
+# and JPEG is what ``<img>`` falls back to.
+FORMATS = (
+    ('AVIF', 'image/avif', 'avif', {'quality': 50}),
+    ('WEBP', 'image/webp', 'webp', {'quality': 75, 'method': 4}),
+    ('JPEG', 'image/jpeg', 'jpg', {'quality': 80, 'progressive': True}),
+)
+CACHE_TIMEOUT = 60 * 60 * 24
+# Images without variants yet, ``build`` clears the entry when done.
+MISSING_TIMEOUT = 60
+
+
+def _cache_key(source):
+    digest = hashlib.md5(source.encode()).hexdigest()
+    return f'posts:image_variants:{digest}'
+
+
+def _formats():
+    Image.init()
+    return [entry for entry in FORMATS if entry[0] in Image.SAVE]
+
+
+def build(source):
+    """Write every variant of ``source`` and replace its old rows and
+    files."""
+    try:
+        with default_storage.open(source) as file:
+            original = Image.open(file)
+            original.load()
+    except (IOError, OSError):
+        logger.exception('Image %s can not be read', source)
+        return
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGB')
+    stem = os.path.splitext(os.path.basename(source))[0]
+    folder = f'variants/{hashlib.md5(source.encode()).hexdigest()[:2]}'
+    widths = [width for width in WIDTHS if width < original.width]
+    widths.append(min(original.width, WIDTHS[-1]))
+    variants = []
+    for width in sorted(set(widths)):
+        height = round(original.height * width / original.width)
+        resized = original.resize((width, height), Image.LANCZOS)
+        for image_format, mime_type, extension, options in _formats():
+            if image_format == 'JPEG' and resized.mode == 'RGBA':
+                image = resized.convert('RGB')
+            else:
+                image = resized
+            buffer = BytesIO()
+            image.save(buffer, image_format, **options)
+            name = default_storage.save(
+                f'{folder}/{stem}-{width}w.{extension}',
+                ContentFile(buffer.getvalue()),
+            )
+            variants.append(ImageVariant(
+                source=source, name=name, mime_type=mime_type,
+                width=width, height=height,
+            ))
+    with transaction.atomic():
+        stale = ImageVariant.objects.filter(source=source)
+        old = (set(stale.values_list('name', flat=True))
+               - {variant.name for variant in variants})
+        stale.delete()
+        ImageVariant.objects.bulk_create(variants)
+    # Only once no row points at them any more.
+    for name in old:
+        default_storage.delete(name)
+    cache.delete(_cache_key(source))
+    posts = (
+        Post.objects.scatter().filter(image=source)
+        .order_by().values_list('pk', flat=True)
+    )
+    for pk in posts:
+        cards.bump('post', pk)
+    page_cache.image_changed(source)
+
+
+def discard(source):
+    """Delete the variant rows and files of an image no post shows any
+    more."""
+    if Post.objects.scatter().filter(image=source).exists():
+        return
+    variants = ImageVariant.objects.filter(source=source)
+    names = list(variants.values_list('name', flat=True))
+    variants.delete()
+    for name in names:
+        default_storage.delete(name)
+    cache.delete(_cache_key(source))
+
+
+def queue(image):
+    """Build the variants of a freshly uploaded image in the background."""
+    if image:
+        name = image.name
+        transaction.on_commit(lambda: thumbnails.submit(build, name))
+
+
+def _load(names):
+    found = {name: {} for name in names}
+    rows = (
+        ImageVariant.objects.filter(source__in=names)
+        .order_by('source', 'width')
+        .values_list('source', 'mime_type', 'name', 'width')
+    )
+    for source, mime_type, name, width in rows:
+        found[source].setdefault(mime_type, []).append(
+            (default_storage.url(name), width)
+        )
+    for name, entry in found.items():
+        cache.set(_cache_key(name), entry,
+                  CACHE_TIMEOUT if entry else MISSING_TIMEOUT)
+    return found
+
+
+def prefetch(images):
+    """Load the variants of many images with one query."""
+    names = {image.name for image in images if image}
+    keys = {_cache_key(name): name for name in names}
+    cached = cache.get_many(keys)
+    missing = [name for key, name in keys.items() if key not in cached]
+    if missing:
+        _load(missing)
+
+
+def variants(image):
+    """``{mime_type: [(url, width), ...]}`` of an image, may be empty."""
+    if not image:
+        return {}
+    found = cache.get(_cache_key(image.name))
+    if found is None:
+        found = _load([image.name])[image.name]
+    return found
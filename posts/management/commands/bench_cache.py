@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from twitter_killer.cache import SQLiteCache
+
+VALUE = {'title': 'x' * 200, 'ids': list(range(20))}
+
+
+def _backend(name, path):
+    if name == 'locmem':
+        return LocMemCache('bench', {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}})
+    return SQLiteCache(path, {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}})
+
+
+def _timed(function, operations):
+    started = time.perf_counter()
+    function()
+    return (time.perf_counter() - started) / operations * 10 ** 6
+
+
+def _single(name, path, count):
+    cache = _backend(name, path)
+    keys = [f'key:{number}' for number in range(count)]
+    batches = [keys[start:start + 10] for start in range(0, count, 10)]
+    cache.set('counter', 0)
+    return {
+        'set': _timed(lambda: [cache.set(key, VALUE) for key in keys], count),
+        'get': _timed(lambda: [cache.get(key) for key in keys], count),
+        'get_many(10)': _timed(
+            lambda: [cache.get_many(batch) for batch in batches],
+            len(batches)
+        ),
+        'set_many(10)': _timed(
+            lambda: [cache.set_many(dict.fromkeys(batch, VALUE))
+                     for batch in batches],
+            len(batches)
+        ),
+        'incr': _timed(
+            lambda: [cache.incr('counter') for _ in range(count)], count
+        ),
+    }
+
+
+def _worker(name, path, keys, reads):
+    """Read-through loop of one web worker, returns its cache misses."""
+    cache = _backend(name, path)
+    misses = 0
+    for number in range(reads):
+        key = f'page:{number % keys}'
+        if cache.get(key) is None:
+            misses += 1
+            cache.set(key, VALUE)
+    return misses
+
+
+class Command(BaseCommand):
+    help = ('Compare the shared SQLite cache with LocMemCache: latency of '
+            'single operations and misses of several worker processes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=5000,
+                            help='Operations per measurement')
+        parser.add_argument('--processes', type=int, default=4,
+                            help='Worker processes sharing the key space')
+        parser.add_argument('--keys', type=int, default=500,
+                            help='Distinct keys the workers read')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            for name in ('locmem', 'sqlite'):
+                path = os.path.join(directory, f'{name}.sqlite3')
+                self.run(name, path, options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run(self, name, path, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        for operation, micros in _single(name, path,
+                                         options['count']).items():
+            self.stdout.write(f'  {operation:<14}{micros:9.1f} µs/op')
+        processes, keys = options['processes'], options['keys']
+        reads = keys * 4
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            misses = sum(pool.map(
+                _worker, [name] * processes, [path + '.shared'] * processes,
+                [keys] * processes, [reads] * processes,
+            ))
+        elapsed = time.perf_counter() - started
+        total = processes * reads
+        self.stdout.write(
+            f'  {processes} processes: {misses} misses of {total} reads '
+            f'({misses / total:.1%}), {total / elapsed:.0f} reads/s'
+        )
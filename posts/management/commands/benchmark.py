@@ -0,0 +1,249 @@
+import argparse
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts import benchmark, tiered_cache
+from posts.models import User
+
+# Any 32 alphanumerics are a valid CSRF secret for cookie and header.
+CSRF_TOKEN = 'b' * 32
+
+
+def _positive(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, not {value}')
+    return number
+
+
+class _Server(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _http(address, method, url, data, cookie):
+    body, headers = None, {'Cookie': cookie}
+    if data is not None:
+        body = urlencode(data)
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        headers['X-CSRFToken'] = CSRF_TOKEN
+    client = http.client.HTTPConnection(*address, timeout=60)
+    try:
+        started = time.perf_counter()
+        client.request(method, url, body, headers)
+        response = client.getresponse()
+        content = response.read()
+        return time.perf_counter() - started, len(content), response.status
+    finally:
+        client.close()
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway database and measure latency, queries and '
+            'response size of every route of posts.urls')
+
+    def add_arguments(self, parser):
+        volumes = parser.add_argument_group('seeded volumes')
+        volumes.add_argument('--users', type=int, default=100)
+        volumes.add_argument('--groups', type=int, default=10)
+        volumes.add_argument('--posts', type=int, default=5000)
+        volumes.add_argument('--comments', type=int, default=10000)
+        volumes.add_argument('--follows', type=int, default=1000)
+        volumes.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--requests', type=_positive, default=50,
+            help='Timed requests per route and driver'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Untimed requests per route before measuring'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Parallel connections of the HTTP driver, 0 skips it'
+        )
+        parser.add_argument(
+            '--route', action='append', dest='routes', metavar='NAME',
+            help='Only measure this route, may be repeated'
+        )
+        parser.add_argument('--save', metavar='NAME',
+                            help='Store the results as baseline NAME')
+        parser.add_argument('--compare', metavar='NAME',
+                            help='Show the change against baseline NAME')
+
+    def handle(self, *args, **options):
+        baseline = self.load(options['compare']) if options[
+            'compare'] else None
+        directory = tempfile.mkdtemp()
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # A file, the threads of the HTTP server need their own
+            # connections to it.
+            test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+        overrides = override_settings(
+            MEDIA_ROOT=os.path.join(directory, 'media'),
+            ALLOWED_HOSTS=['*'],
+            CACHES={'default': {
+                **settings.CACHES['default'], 'LOCATION': '',
+            }},
+        )
+        overrides.enable()
+        old_name = connection.creation.create_test_db(verbosity=0,
+                                                      serialize=False)
+        try:
+            results = self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            overrides.disable()
+            shutil.rmtree(directory, ignore_errors=True)
+        for driver, stats in results.items():
+            self.report(driver, stats, (baseline or {}).get(driver, {}))
+        if options['save']:
+            self.save(options['save'], options, results)
+
+    def measure(self, options):
+        started = time.monotonic()
+        benchmark.seed(options['users'], options['groups'],
+                       options['posts'], options['comments'],
+                       options['follows'], options['seed'])
+        self.stdout.write(f'Seeded in {time.monotonic() - started:.1f}s')
+        reader = User.objects.order_by('pk').first()
+        routes = benchmark.routes(reader)
+        if options['routes']:
+            unknown = set(options['routes']) - {r.name for r in routes}
+            if unknown:
+                raise CommandError(f'Unknown routes: {", ".join(unknown)}')
+            routes = [r for r in routes if r.name in options['routes']]
+        cache.clear()
+        tiered_cache.clear_local()
+        results = {'client': self.run_client(routes, reader, options)}
+        if options['concurrency']:
+            results['http'] = self.run_http(routes, reader, options)
+        return results
+
+    def run_client(self, routes, reader, options):
+        guest, member = Client(), Client()
+        member.force_login(reader)
+        stats = {}
+        for route in routes:
+            client = member if route.auth else guest
+            send = client.post if route.method == 'POST' else client.get
+            for _ in range(options['warmup']):
+                send(*route.target())
+            timings, queries, sizes, errors = [], [], [], 0
+            for _ in range(options['requests']):
+                url, data = route.target()
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = send(url, data)
+                    timings.append(time.perf_counter() - started)
+                queries.append(len(context.captured_queries))
+                sizes.append(len(response.content))
+                errors += response.status_code >= 400
+            stats[route.name] = benchmark.summarize(timings, queries, sizes,
+                                                    errors)
+        return stats
+
+    def run_http(self, routes, reader, options):
+        member = Client()
+        member.force_login(reader)
+        session = member.cookies[settings.SESSION_COOKIE_NAME].value
+        guest_cookie = f'{settings.CSRF_COOKIE_NAME}={CSRF_TOKEN}'
+        member_cookie = (f'{guest_cookie}; '
+                         f'{settings.SESSION_COOKIE_NAME}={session}')
+        server = make_server('127.0.0.1', 0, WSGIHandler(),
+                             server_class=_Server,
+                             handler_class=_QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stats = {}
+        try:
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                for route in routes:
+                    cookie = member_cookie if route.auth else guest_cookie
+                    count = options['warmup'] + options['requests']
+                    # Targets may write to the database, build them first.
+                    targets = [route.target() for _ in range(count)]
+                    results = list(pool.map(
+                        lambda target: _http(server.server_address,
+                                             route.method, *target, cookie),
+                        targets,
+                    ))[options['warmup']:]
+                    stats[route.name] = benchmark.summarize(
+                        [elapsed for elapsed, _, _ in results], [],
+                        [size for _, size, _ in results],
+                        sum(status >= 400 for _, _, status in results),
+                    )
+        finally:
+            server.shutdown()
+            server.server_close()
+        return stats
+
+    def report(self, driver, stats, baseline):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{driver}'))
+        self.stdout.write(
+            f'{"route":<24}{"n":>5}{"err":>5}{"p50 ms":>9}{"p95 ms":>9}'
+            f'{"p99 ms":>9}{"queries":>9}{"bytes":>9}{"p95 vs base":>13}'
+        )
+        for name, row in stats.items():
+            queries = '-' if row.queries is None else f'{row.queries:.1f}'
+            change = ''
+            if name in baseline and baseline[name]['p95']:
+                delta = row.p95 / baseline[name]['p95'] - 1
+                change = f'{delta:+.0%}'
+            line = (
+                f'{name:<24}{row.count:>5}{row.errors:>5}{row.p50:>9.1f}'
+                f'{row.p95:>9.1f}{row.p99:>9.1f}{queries:>9}'
+                f'{row.bytes:>9.0f}{change:>13}'
+            )
+            if row.errors:
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+    def path(self, name):
+        return os.path.join(settings.BENCHMARK_DIR, f'{name}.json')
+
+    def load(self, name):
+        try:
+            with open(self.path(name)) as file:
+                return json.load(file)['results']
+        except FileNotFoundError:
+            raise CommandError(f'No baseline {name} in '
+                               f'{settings.BENCHMARK_DIR}')
+
+    def save(self, name, options, results):
+        os.makedirs(settings.BENCHMARK_DIR, exist_ok=True)
+        volumes = ('users', 'groups', 'posts', 'comments', 'follows',
+                   'seed', 'requests', 'concurrency')
+        data = {
+            'options': {key: options[key] for key in volumes},
+            'results': {
+                driver: {name: row._asdict() for name, row in stats.items()}
+                for driver, stats in results.items()
+            },
+        }
+        with open(self.path(name), 'w') as file:
+            json.dump(data, file, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Baseline saved to {self.path(name)}'
+        ))
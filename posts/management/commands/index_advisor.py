@@ -0,0 +1,177 @@
+import os
+import re
+import sqlite3
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts import slow_queries, tiered_cache
+from posts.models import Group, Post
+from posts.paginator import encode_cursor
+from posts.urls import app_name, urlpatterns
+
+# A GET on these writes.
+WRITES = ('post_delete', 'delete_comment', 'profile_follow',
+          'profile_unfollow')
+# Feeds are also read past a cursor, a different query.
+CURSOR_PAGES = ('index', 'follow_index', 'group_posts', 'profile')
+# Queries starting from these are left out: the groups are a few rows,
+# the full-text matches are ranked and always sorted.
+IGNORED = ('posts_group', 'posts_post_fts')
+TABLE = re.compile(r'(?:SCAN|SEARCH) (?:TABLE )?(\w+)')
+FULL_SCAN = re.compile(r'SCAN (?:TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+def issues(plan, ignore=IGNORED):
+    """Lines of an ``EXPLAIN QUERY PLAN`` reading a whole table or
+    sorting in a temporary B-tree, none if it starts from an ``ignore``
+    table."""
+    first = TABLE.match(plan[0]) if plan else None
+    if first and first.group(1) in ignore:
+        return []
+    return [line for line in plan
+            if FULL_SCAN.match(line) or TEMP_SORT in line]
+
+
+class Command(BaseCommand):
+    help = ('Replay the read views of posts and report the queries whose '
+            'plan scans a whole table or sorts in a temporary B-tree. '
+            'They run against a copy of every database, thrown away after')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Exit with an error when a query is reported'
+        )
+
+    def handle(self, *args, **options):
+        self.found = {}
+        self.view = None
+        samples = self.samples()
+        with ExitStack() as stack:
+            # Cached pages and rows would hide the queries.
+            stack.enter_context(override_settings(
+                CACHES=NO_CACHE, ALLOWED_HOSTS=['testserver'],
+            ))
+            # Logging in and the views may write, a transaction held for
+            # the whole replay would lock the site out instead.
+            stack.enter_context(self.copies())
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(self.capture)
+                )
+            client = Client()
+            client.force_login(samples['user'])
+            for self.view, url in self.requests(samples):
+                tiered_cache.clear_local()
+                client.get(url)
+        for sql, query in self.found.items():
+            self.stdout.write(self.style.WARNING('; '.join(query['plan'])))
+            self.stdout.write(f'  {sql[:300]}')
+            self.stdout.write(f'  at {query["site"]}')
+            self.stdout.write(f'  in {", ".join(query["views"])}')
+        views = {view for query in self.found.values()
+                 for view in query['views']}
+        summary = f'{len(self.found)} queries to index in {len(views)} views'
+        if self.found and options['check']:
+            raise CommandError(summary)
+        style = self.style.WARNING if self.found else self.style.SUCCESS
+        self.stdout.write(style(summary))
+
+    @contextmanager
+    def copies(self):
+        """Point every database alias at a copy of its file."""
+        aliases = list(connections)
+        names = {alias: connections[alias].settings_dict['NAME']
+                 for alias in aliases}
+        with tempfile.TemporaryDirectory() as directory:
+            copies = {}
+            for alias in aliases:
+                connection = connections[alias]
+                if connection.vendor != 'sqlite':
+                    raise CommandError(f'{alias} is not an SQLite database')
+                if connection.is_in_memory_db():
+                    raise CommandError(f'{alias} is in memory, not a file')
+                if names[alias] not in copies:
+                    copies[names[alias]] = os.path.join(
+                        directory, f'{alias}.sqlite3'
+                    )
+                    connection.ensure_connection()
+                    copy = sqlite3.connect(copies[names[alias]])
+                    try:
+                        connection.connection.backup(copy)
+                    finally:
+                        copy.close()
+            try:
+                for alias in aliases:
+                    connections[alias].close()
+                    connections[alias].settings_dict['NAME'] = (
+                        copies[names[alias]]
+                    )
+                yield
+            finally:
+                for alias in aliases:
+                    connections[alias].close()
+                    connections[alias].settings_dict['NAME'] = names[alias]
+
+    def samples(self):
+        """Objects of the database to fill the URLs with."""
+        commented = (
+            Post.objects.scatter().select_related('author', 'group')
+            .order_by('-comments_count', '-pk')[:1]
+        )
+        post = next(iter(commented), None)
+        if post is None:
+            raise CommandError('There are no posts to replay the views on')
+        comment = post.comments.first()
+        group = post.group or Group.objects.first()
+        return {
+            'user': post.author,
+            'username': post.author.username,
+            'post_id': post.pk,
+            'comment_id': comment and comment.pk,
+            'slug': group and group.slug,
+            'q': post.text.split()[0] if post.text.split() else 'a',
+            'after': encode_cursor(post),
+        }
+
+    def requests(self, samples):
+        for pattern in urlpatterns:
+            name = pattern.name
+            if name in WRITES:
+                continue
+            kwargs = {key: samples[key]
+                      for key in pattern.pattern.converters}
+            if None in kwargs.values():
+                self.stderr.write(f'{name}: nothing to fill it with')
+                continue
+            url = reverse(f'{app_name}:{name}', kwargs=kwargs)
+            if name == 'search':
+                url = f'{url}?q={samples["q"]}'
+            yield f'{app_name}:{name}', url
+            if name in CURSOR_PAGES:
+                yield (f'{app_name}:{name} after a cursor',
+                       f'{url}?page=2&after={samples["after"]}')
+
+    def capture(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if many:
+            return result
+        plan = issues(slow_queries.explain(context['connection'], sql,
+                                           params))
+        if plan:
+            site, template = slow_queries.call_site()
+            query = self.found.setdefault(slow_queries.normalize(sql), {
+                'plan': plan, 'site': template or site, 'views': [],
+            })
+            if self.view not in query['views']:
+                query['views'].append(self.view)
+        return result
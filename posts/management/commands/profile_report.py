@@ -0,0 +1,68 @@
+import io
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import profiling
+
+SORT_KEYS = ('tottime', 'cumulative', 'ncalls')
+
+
+class Command(BaseCommand):
+    help = ('Sum the request profiles in PROFILING_DIR and show the '
+            'hottest functions of every view')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Only this url name')
+        parser.add_argument('--limit', type=int, default=15,
+                            help='Functions shown per view')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='tottime')
+        parser.add_argument('--output', metavar='FILE',
+                            help='Also write the summed pstats to FILE')
+        parser.add_argument(
+            '--token', action='store_true',
+            help='Only print an X-Profile header value and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(profiling.token())
+            return
+        paths = profiling.dumps(options['view'])
+        if not paths:
+            raise CommandError('No profiles to report on')
+        by_view = {}
+        for path in paths:
+            by_view.setdefault(profiling.view_of(path), []).append(path)
+        for view, view_paths in sorted(by_view.items()):
+            stats = pstats.Stats(*view_paths, stream=io.StringIO())
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'\n{view}: {len(view_paths)} requests, '
+                f'{stats.total_tt / len(view_paths) * 1000:.1f}ms each'
+            ))
+            self.stdout.write(
+                f'{"calls":>9}{"tottime":>10}{"cumtime":>10}  function'
+            )
+            rows = sorted(
+                stats.stats.items(),
+                key=lambda item: self.sort_value(item[1], options['sort']),
+                reverse=True,
+            )
+            for (filename, line, function), row in rows[:options['limit']]:
+                _, calls, tottime, cumtime, _ = row
+                self.stdout.write(
+                    f'{calls:>9}{tottime:>10.4f}{cumtime:>10.4f}  '
+                    f'{filename}:{line}({function})'
+                )
+        if options['output']:
+            pstats.Stats(*paths, stream=io.StringIO()).dump_stats(
+                options['output']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Summed profile written to {options["output"]}'
+            ))
+
+    def sort_value(self, row, key):
+        _, calls, tottime, cumtime, _ = row
+        return {'tottime': tottime, 'cumulative': cumtime,
+                'ncalls': calls}[key]
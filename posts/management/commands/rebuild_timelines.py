@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow, Timeline, User
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized follow feeds from the current follows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Only rebuild feeds of these users'
+        )
+
+    def handle(self, *args, **options):
+        readers = User.objects.filter(
+            pk__in=Follow.objects.values('user_id')
+        )
+        if options['usernames']:
+            readers = User.objects.filter(username__in=options['usernames'])
+        else:
+            Timeline.objects.exclude(user__in=readers).delete()
+        count = 0
+        for user_id in readers.values_list('pk', flat=True).iterator():
+            timeline.rebuild(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} timelines'))
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Recount Post.comments_count from the comments table'
+
+    def handle(self, *args, **options):
+        # Comments live next to their posts, every shard is recounted
+        # on its own.
+        drifted = sum(
+            self.reconcile(using)
+            for using in settings.POST_SHARDS or [DEFAULT_DB_ALIAS]
+        )
+        self.stdout.write(self.style.SUCCESS(f'Fixed {drifted} posts'))
+
+    def reconcile(self, using):
+        counts = (
+            Comment.objects.filter(post=OuterRef('pk'))
+            .order_by().values('post').annotate(count=Count('pk'))
+            .values('count')
+        )
+        actual = Coalesce(Subquery(counts), Value(0))
+        posts = Post.objects.using(using)
+        drifted = (
+            posts.annotate(actual=actual)
+            .exclude(comments_count=F('actual')).count()
+        )
+        if drifted:
+            posts.update(comments_count=actual)
+        return drifted
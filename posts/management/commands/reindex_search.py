@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of posts'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Full-text index needs the SQLite backend')
+        count = search.reindex()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} posts'))
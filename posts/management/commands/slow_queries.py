@@ -0,0 +1,80 @@
+import glob
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = ('total', 'count', 'max')
+
+
+class Command(BaseCommand):
+    help = ('Top offenders of the slow query log, grouped by normalized '
+            'SQL with their call sites and query plans')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', action='append', dest='files', metavar='PATH',
+            help='Log to read, SLOW_QUERY_LOG and its rotations by default'
+        )
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--sort', choices=SORT_KEYS, default='total')
+
+    def handle(self, *args, **options):
+        files = options['files'] or sorted(
+            glob.glob(glob.escape(settings.SLOW_QUERY_LOG) + '*')
+        )
+        groups = {}
+        for path in files:
+            try:
+                with open(path, encoding='utf-8') as log:
+                    for line in log:
+                        self.add(groups, line)
+            except FileNotFoundError:
+                raise CommandError(f'No slow query log at {path}')
+        if not groups:
+            self.stdout.write('No slow queries logged')
+            return
+        ranked = sorted(groups.values(),
+                        key=lambda group: group[options['sort']],
+                        reverse=True)
+        for group in ranked[:options['limit']]:
+            self.report(group)
+
+    def add(self, groups, line):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return
+        group = groups.setdefault(entry['fingerprint'], {
+            'sql': entry['sql'], 'count': 0, 'total': 0.0, 'max': 0.0,
+            'params': set(), 'sites': Counter(), 'templates': Counter(),
+            'plan': [],
+        })
+        group['count'] += 1
+        group['total'] += entry['duration_ms']
+        group['max'] = max(group['max'], entry['duration_ms'])
+        group['params'].add(entry['params'])
+        group['sites'][entry['site']] += 1
+        if entry['template']:
+            group['templates'][entry['template']] += 1
+        if entry['plan']:
+            group['plan'] = entry['plan']
+
+    def report(self, group):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\n{group["count"]} queries, {group["total"]:.0f}ms total, '
+            f'{group["total"] / group["count"]:.1f}ms mean, '
+            f'{group["max"]:.1f}ms max, '
+            f'{len(group["params"])} distinct parameter sets'
+        ))
+        self.stdout.write(f'  {group["sql"]}')
+        for site, count in group['sites'].most_common(3):
+            self.stdout.write(f'  from {site or "outside the project"} '
+                              f'({count})')
+        for template, count in group['templates'].most_common(3):
+            self.stdout.write(f'  in {template} ({count})')
+        for step in group['plan']:
+            style = self.style.WARNING if step.startswith(
+                'SCAN') else str
+            self.stdout.write(style(f'  plan: {step}'))
@@ -0,0 +1,180 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections, transaction
+
+from posts import benchmark
+
+# Stock SQLite and Django: rollback journal, deferred transactions. Then
+# the production pragmas with either way of beginning a transaction.
+MODES = {
+    'stock': {},
+    'deferred': {'production': True, 'transaction_mode': 'DEFERRED'},
+    'immediate': {'production': True},
+}
+SCHEMA = (
+    '''CREATE TABLE post (
+        id INTEGER PRIMARY KEY, author_id INTEGER NOT NULL,
+        text TEXT NOT NULL, pub_date REAL NOT NULL,
+        comments_count INTEGER NOT NULL DEFAULT 0
+    )''',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+    '''CREATE TABLE comment (
+        id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL,
+        author_id INTEGER NOT NULL, text TEXT NOT NULL
+    )''',
+)
+
+
+class Command(BaseCommand):
+    help = ('Hammer a throwaway SQLite database with concurrent new_post '
+            'and add_comment writes and feed reads, stock settings '
+            'against the production mode with deferred and immediate '
+            'transactions')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--posts', type=int, default=1000,
+                            help='Posts in the database before the run')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            results = {
+                mode: self.run(mode, os.path.join(directory, mode), options)
+                for mode in MODES
+            }
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        self.stdout.write(
+            f'{"mode":<12}{"writes/s":>10}{"reads/s":>10}{"locked":>8}'
+            f'{"write p95 ms":>14}'
+        )
+        for mode, row in results.items():
+            self.stdout.write(
+                f'{mode:<12}{row["writes"]:>10.0f}{row["reads"]:>10.0f}'
+                f'{row["locked"]:>8}{row["p95"]:>14.1f}'
+            )
+        deferred, immediate = results['deferred'], results['immediate']
+        if deferred['writes']:
+            self.stdout.write(self.style.SUCCESS(
+                'BEGIN IMMEDIATE: '
+                f'x{immediate["writes"] / deferred["writes"]:.1f} writes, '
+                f'{immediate["locked"]} locked against '
+                f'{deferred["locked"]}'
+            ))
+
+    def run(self, mode, path, options):
+        alias = f'sqlite_stress_{mode}'
+        connections.databases[alias] = {
+            'ENGINE': 'twitter_killer.sqlite', 'NAME': path,
+            'OPTIONS': MODES[mode],
+        }
+        try:
+            self.seed(alias, options['posts'])
+            return self.hammer(alias, options)
+        finally:
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+
+    def seed(self, alias, posts):
+        with connections[alias].cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            now = time.time()
+            for start in range(0, posts, benchmark.BATCH_SIZE):
+                rows = range(start, min(start + benchmark.BATCH_SIZE, posts))
+                cursor.executemany(
+                    'INSERT INTO post (author_id, text, pub_date) '
+                    'VALUES (%s, %s, %s)',
+                    [(number % 50, f'post {number}', now - posts + number)
+                     for number in rows],
+                )
+
+    def hammer(self, alias, options):
+        deadline = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        totals = {'writes': 0, 'reads': 0, 'locked': 0, 'latencies': []}
+
+        def writer(seed):
+            rnd = random.Random(seed)
+            writes, locked, latencies = 0, 0, []
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic(using=alias):
+                        self.write(connections[alias], rnd,
+                                   options['posts'])
+                except DatabaseError:
+                    locked += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                writes += 1
+            connections[alias].close()
+            with lock:
+                totals['writes'] += writes
+                totals['locked'] += locked
+                totals['latencies'] += latencies
+
+        def reader():
+            reads = 0
+            while time.monotonic() < deadline:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(
+                        'SELECT p.id, p.text, p.comments_count FROM post p '
+                        'ORDER BY p.pub_date DESC LIMIT 10'
+                    )
+                    cursor.fetchall()
+                reads += 1
+            connections[alias].close()
+            with lock:
+                totals['reads'] += reads
+
+        threads = [threading.Thread(target=writer, args=(number,))
+                   for number in range(options['writers'])]
+        threads += [threading.Thread(target=reader)
+                    for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        latencies = totals['latencies']
+        return {
+            'writes': totals['writes'] / options['seconds'],
+            'reads': totals['reads'] / options['seconds'],
+            'locked': totals['locked'],
+            'p95': benchmark.percentile(latencies, 0.95) * 1000
+            if latencies else 0.0,
+        }
+
+    def write(self, connection, rnd, posts):
+        """``add_comment`` reads the post before writing, or ``new_post``."""
+        with connection.cursor() as cursor:
+            if rnd.random() < 0.25:
+                cursor.execute(
+                    'INSERT INTO post (author_id, text, pub_date) '
+                    'VALUES (%s, %s, %s)',
+                    (rnd.randrange(50), 'stress post', time.time()),
+                )
+                return
+            post_id = rnd.randint(1, posts)
+            cursor.execute('SELECT comments_count FROM post WHERE id = %s',
+                           (post_id,))
+            cursor.fetchone()
+            cursor.execute(
+                'INSERT INTO comment (post_id, author_id, text) '
+                'VALUES (%s, %s, %s)',
+                (post_id, rnd.randrange(50), 'stress comment'),
+            )
+            cursor.execute(
+                'UPDATE post SET comments_count = comments_count + 1 '
+                'WHERE id = %s', (post_id,)
+            )
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts.replicas import PRIMARY
+
+
+class Command(BaseCommand):
+    help = ('Copy the primary SQLite database over every replica of '
+            'DATABASE_REPLICAS')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, metavar='SECONDS',
+            help='Keep copying every SECONDS until interrupted'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('DATABASE_REPLICAS is empty')
+        if connections[PRIMARY].vendor != 'sqlite':
+            raise CommandError('Only SQLite replicas can be copied')
+        while True:
+            started = time.monotonic()
+            for alias in settings.DATABASE_REPLICAS:
+                self.copy(connections[PRIMARY],
+                          settings.DATABASES[alias]['NAME'])
+            self.stdout.write(
+                f'Synced {len(settings.DATABASE_REPLICAS)} replicas in '
+                f'{time.monotonic() - started:.2f}s'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, source, path):
+        """Online backup of ``source``, swapped in atomically.
+
+        Readers keep the snapshot they opened, the next connection sees
+        the new copy. Replicas stay out of WAL mode, a copy swapped in
+        must not meet the -wal file of the old one.
+        """
+        source.ensure_connection()
+        partial = f'{path}.partial'
+        copy = sqlite3.connect(partial)
+        try:
+            source.connection.backup(copy)
+            copy.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            copy.close()
+        os.replace(partial, path)
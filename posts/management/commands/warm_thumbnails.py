@@ -0,0 +1,88 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import images, thumbnails
+from posts.models import ImageVariant, Post, User
+
+SOURCES = (
+    (Post, 'image', thumbnails.POST_GEOMETRIES),
+)
+# Avatars are only shown through the responsive variants of posts.images,
+# no template passes them to {% thumbnail %}.
+VARIANT_SOURCES = (
+    (Post, 'image'),
+    (User, 'avatar'),
+)
+
+
+def _init_worker():
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = ('Generate every thumbnail and responsive image variant the '
+            'templates use in parallel, images already done are skipped '
+            'so runs can resume')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Number of worker processes, all cores by default, '
+                 '1 generates in this process'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = created = built = 0
+        for model, field, geometries in SOURCES:
+            names = self.names(model, field)
+            created += sum(self.map(
+                partial(thumbnails.generate, geometries=geometries),
+                names, options['workers'],
+            ))
+            total += len(names)
+            self.stdout.write(
+                f'{model._meta.label}.{field}: {len(names)} images'
+            )
+        done = set(
+            ImageVariant.objects.order_by()
+            .values_list('source', flat=True).distinct()
+        )
+        for model, field in VARIANT_SOURCES:
+            names = [name for name in self.names(model, field)
+                     if name not in done]
+            self.map(images.build, names, options['workers'])
+            built += len(names)
+            self.stdout.write(
+                f'{model._meta.label}.{field}: {len(names)} images '
+                'without variants'
+            )
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} images, {created} thumbnails created, '
+            f'{built} images given variants in {elapsed:.1f}s '
+            f'({rate:.1f} images/s)'
+        ))
+
+    def names(self, model, field):
+        return list(
+            model.objects.exclude(**{field: ''})
+            .exclude(**{f'{field}__isnull': True})
+            .values_list(field, flat=True)
+        )
+
+    def map(self, function, names, workers):
+        if workers <= 1:
+            return list(map(function, names))
+        # Forked workers must not share the parent's connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker) as pool:
+            return list(pool.map(function, names, chunksize=16))
@@ -0,0 +1,272 @@
+"""Prometheus metrics of every worker process behind one ``/metrics``.
+
+Each process counts in memory. At most every ``METRICS_FLUSH_INTERVAL``
+seconds it writes a snapshot of its own values to the SQLite file at
+``METRICS_LOCATION``, replacing its previous snapshot. ``/metrics`` sums
+the snapshots of all processes, so the numbers survive worker restarts.
+A scrape folds the counters and histograms of processes that exited
+into a single ``retired`` snapshot and drops their gauges, the file
+stays as small as the running workers. An empty ``METRICS_LOCATION``
+keeps the metrics of the process to itself.
+"""
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from . import timing
+
+COUNTER, GAUGE, HISTOGRAM = 'counter', 'gauge', 'histogram'
+METRICS = {
+    'http_request_duration_seconds': (
+        HISTOGRAM, 'Request latency by url name and status code'),
+    'http_requests_in_flight': (GAUGE, 'Requests being served'),
+    'db_queries_total': (COUNTER, 'Database queries by url name'),
+    'db_query_duration_seconds_total': (
+        COUNTER, 'Time spent in database queries by url name'),
+    'cache_requests_total': (
+        COUNTER, 'Cache lookups by cache and hit or miss'),
+    'thumbnails_generated_total': (COUNTER, 'Thumbnails written'),
+    'thumbnail_generation_seconds': (
+        HISTOGRAM, 'Time to write one thumbnail'),
+}
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SCHEMA = '''CREATE TABLE IF NOT EXISTS metrics (
+    process TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    family TEXT NOT NULL,
+    sample TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL
+)'''
+
+# Process of the snapshot exited workers are summed into.
+RETIRED = 'retired'
+
+_lock = threading.Lock()
+_values = {}
+_histograms = {}
+_process = None
+_flushed = 0.0
+
+
+def _forget():
+    """Forked workers start from zero, the parent reports its own."""
+    global _lock, _process, _flushed
+    _lock = threading.Lock()
+    _values.clear()
+    _histograms.clear()
+    _process, _flushed = None, 0.0
+
+
+os.register_at_fork(after_in_child=_forget)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Add ``amount`` to a counter or gauge."""
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """Count ``value`` in the buckets of a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        row = _histograms.get(key)
+        if row is None:
+            row = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        row[0][bisect.bisect_left(BUCKETS, value)] += 1
+        row[1] += value
+
+
+def _samples():
+    """``(family, sample, labels, value)`` of this process."""
+    with _lock:
+        values = list(_values.items())
+        histograms = [(key, list(counts), total)
+                      for key, (counts, total) in _histograms.items()]
+    samples = [(name, name, labels, value)
+               for (name, labels), value in values]
+    for (name, labels), counts, total in histograms:
+        cumulative = 0
+        for bound, count in zip([*BUCKETS, '+Inf'], counts):
+            cumulative += count
+            samples.append((name, f'{name}_bucket',
+                            (*labels, ('le', str(bound))), cumulative))
+        samples.append((name, f'{name}_sum', labels, total))
+        samples.append((name, f'{name}_count', labels, cumulative))
+    return samples
+
+
+def _connect():
+    connection = sqlite3.connect(settings.METRICS_LOCATION, timeout=5)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute(SCHEMA)
+    return connection
+
+
+def flush():
+    """Replace the snapshot of this process in the shared file."""
+    global _process, _flushed
+    if not settings.METRICS_LOCATION:
+        return
+    if _process is None:
+        _process = f'{os.getpid()}-{uuid.uuid4().hex}'
+    pid = os.getpid()
+    rows = [(_process, pid, family, sample, json.dumps(labels), value)
+            for family, sample, labels, value in _samples()]
+    with closing(_connect()) as connection, connection:
+        connection.execute('DELETE FROM metrics WHERE process = ?',
+                           (_process,))
+        connection.executemany(
+            'INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?)', rows
+        )
+    _flushed = time.monotonic()
+
+
+def maybe_flush():
+    if time.monotonic() - _flushed >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _fold(connection):
+    """Sum the snapshots of exited processes into ``RETIRED``."""
+    with connection:
+        # Taken before reading, two scrapes must not fold the same rows.
+        connection.execute('BEGIN IMMEDIATE')
+        pids = [pid for pid, in connection.execute(
+            'SELECT DISTINCT pid FROM metrics WHERE process != ?',
+            (RETIRED,),
+        )]
+        dead = [pid for pid in pids if not _alive(pid)]
+        if not dead:
+            return
+        folded = ('WHERE process = ? OR (process != ? AND pid IN ({}))'
+                  .format(', '.join('?' * len(dead))))
+        params = (RETIRED, RETIRED, *dead)
+        rows = connection.execute(
+            'SELECT family, sample, labels, SUM(value) FROM metrics '
+            f'{folded} GROUP BY family, sample, labels', params,
+        ).fetchall()
+        connection.execute(f'DELETE FROM metrics {folded}', params)
+        connection.executemany(
+            'INSERT INTO metrics VALUES (?, 0, ?, ?, ?, ?)',
+            [(RETIRED, family, sample, labels, value)
+             for family, sample, labels, value in rows
+             if METRICS.get(family, (GAUGE,))[0] != GAUGE],
+        )
+
+
+def collect():
+    """``{family: {(sample, labels): value}}`` summed over processes."""
+    if not settings.METRICS_LOCATION:
+        rows = [(family, sample, labels, value, os.getpid())
+                for family, sample, labels, value in _samples()]
+    else:
+        flush()
+        with closing(_connect()) as connection:
+            _fold(connection)
+            rows = [
+                (family, sample,
+                 tuple(tuple(pair) for pair in json.loads(labels)),
+                 value, pid)
+                for family, sample, labels, value, pid in connection.execute(
+                    'SELECT family, sample, labels, value, pid FROM metrics'
+                )
+            ]
+    alive = {}
+    families = {}
+    for family, sample, labels, value, pid in rows:
+        if METRICS.get(family, (GAUGE,))[0] == GAUGE:
+            if pid not in alive:
+                alive[pid] = _alive(pid)
+            if not alive[pid]:
+                continue
+        samples = families.setdefault(family, {})
+        key = (sample, labels)
+        samples[key] = samples.get(key, 0) + value
+    return families
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return f'{{{pairs}}}'
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render():
+    """Metrics of every process in the Prometheus text format."""
+    lines = []
+    for family, samples in sorted(collect().items()):
+        kind, description = METRICS.get(family, (GAUGE, family))
+        lines.append(f'# HELP {family} {description}')
+        lines.append(f'# TYPE {family} {kind}')
+        for (sample, labels), value in samples.items():
+            lines.append(f'{sample}{_format_labels(labels)} '
+                         f'{_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Scrape target, only for ``INTERNAL_IPS``."""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inc('http_requests_in_flight')
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            inc('http_requests_in_flight', -1)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        observe('http_request_duration_seconds',
+                time.perf_counter() - started,
+                view=view, status=str(response.status_code))
+        timer = getattr(request, 'timing', None)
+        if isinstance(timer, timing.Timer):
+            inc('db_queries_total', timer.queries, view=view)
+            inc('db_query_duration_seconds_total',
+                timer.phases.get('db', 0.0), view=view)
+        maybe_flush()
+        return response
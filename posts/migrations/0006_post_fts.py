@@ -0,0 +1,33 @@
+from django.db import migrations
+
+CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5("
+    "text, discription, tokenize = 'unicode61 remove_diacritics 2')"
+)
+FILL = (
+    'INSERT INTO posts_post_fts (rowid, text, discription) '
+    'SELECT id, text, discription FROM posts_post'
+)
+DROP = 'DROP TABLE IF EXISTS posts_post_fts'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE)
+        schema_editor.execute(FILL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_timeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def count_comments(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    counts = (
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by().values('post').annotate(count=Count('pk'))
+        .values('count')
+    )
+    Post.objects.filter(comments__isnull=False).update(
+        comments_count=Subquery(counts)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
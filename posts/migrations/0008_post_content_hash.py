@@ -0,0 +1,34 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_contents(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('text', 'discription').iterator()
+    batch = []
+    for post in posts:
+        content = f'{post.discription or ""}\0{post.text or ""}'
+        post.content_hash = hashlib.sha256(content.encode()).hexdigest()
+        batch.append(post)
+        if len(batch) == 1000:
+            Post.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    Post.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_hash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=64, verbose_name='Хеш содержания'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(hash_contents, migrations.RunPython.noop),
+    ]
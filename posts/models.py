@@ -1,10 +1,20 @@
+import hashlib
+
 from django.contrib.auth import get_user_model
 from django.db import models
 from pytils.translit import slugify
 
+from .shards import ShardedManager
+
 User = get_user_model()
 
 
+def content_hash(text, discription):
+    """SHA-256 of the post content, ``None`` and empty title are equal."""
+    content = f'{discription or ""}\0{text or ""}'
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200,
                              verbose_name='Название группы')
@@ -43,15 +53,51 @@ class Post(models.Model):
                               related_name='posts')
     image = models.ImageField(upload_to='posts/', verbose_name='Изображение',
                               blank=True, null=True)
+    comments_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество комментариев'
+    )
+    content_hash = models.CharField(
+        max_length=64, db_index=True, editable=False,
+        verbose_name='Хеш содержания'
+    )
+
+    objects = ShardedManager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ascending, read backwards they give the (-pub_date, -id) order
+        # of the feeds, the rowid being the last column of every index.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['comments_count'],
+                         name='post_comments_count_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        self.content_hash = content_hash(self.text, self.discription)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if update_fields & {'text', 'discription'}:
+                kwargs['update_fields'] = update_fields | {'content_hash'}
+        elif not self._state.adding:
+            # comments_count is maintained with F() updates, saving an
+            # edited post must not write back the value loaded with it.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post,
@@ -66,10 +112,16 @@ class Comment(models.Model):
     created = models.DateTimeField(auto_now_add=True,
                                    verbose_name='Дата комментария')
 
+    objects = ShardedManager()
+
     class Meta:
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -94,3 +146,53 @@ class Follow(models.Model):
                 name='unique_user_author'
             )
         ]
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             verbose_name='Читатель')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             verbose_name='Пост')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+
+
+class ImageVariant(models.Model):
+    source = models.CharField(max_length=255, db_index=True,
+                              verbose_name='Исходное изображение')
+    name = models.CharField(max_length=255, verbose_name='Файл варианта')
+    mime_type = models.CharField(max_length=20, verbose_name='Формат')
+    width = models.PositiveIntegerField(verbose_name='Ширина')
+    height = models.PositiveIntegerField(verbose_name='Высота')
+
+    class Meta:
+        ordering = ['width']
+        verbose_name = 'Вариант изображения'
+        verbose_name_plural = 'Варианты изображений'
+        indexes = [
+            models.Index(fields=['source', 'width'],
+                         name='imagevariant_source_width_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,119 @@
+"""Top of the most commented posts kept in the shared cache.
+
+The cache holds the ids and comment counts of up to ``DEPTH`` leaders
+and ``floor``, an upper bound of the count of every post left out of the
+list. Comment signals adjust it in place, so the widget never has to run
+an aggregate over the whole posts table; it is only rebuilt with one
+``ORDER BY comments_count`` read when the entry is missing or can no
+longer prove its first ``SIZE`` posts are the real leaders.
+
+Writers never wait for each other. Each one first claims the entry by
+writing its own token next to it, then edits and stores it; a writer
+that finds the claim taken over by another one meanwhile drops the
+entry, as one of the two copies may be missing the other change, and
+the next read rebuilds it. Every change bumps ``SCOPE`` for the caches
+built from the top.
+"""
+import uuid
+
+from django.core.cache import cache
+
+from . import page_cache
+from .models import Post
+
+CACHE_KEY = 'posts:most_commented'
+CLAIM_KEY = f'{CACHE_KEY}:claim'
+SCOPE = 'most_commented'
+SIZE = 5
+DEPTH = 20
+TIMEOUT = 60 * 60
+
+
+def _sorted(entries):
+    return sorted(entries.items(), key=lambda entry: (-entry[1], -entry[0]))
+
+
+def _drop():
+    cache.delete(CACHE_KEY)
+    page_cache.bump(SCOPE)
+
+
+def _change(edit):
+    """Run ``edit(top)`` on the cached top under a fresh claim."""
+    token = uuid.uuid4().hex
+    cache.set(CLAIM_KEY, token, None)
+    top = cache.get(CACHE_KEY)
+    if top is not None:
+        edit(top)
+        if cache.get(CLAIM_KEY) != token:
+            _drop()
+
+
+def rebuild():
+    """Read the top from ``comments_count`` and store it, dropped again
+    if a writer claimed the entry during the read."""
+    claim = cache.get(CLAIM_KEY)
+    rows = [
+        (post.pk, post.comments_count) for post in
+        Post.objects.scatter().filter(comments_count__gt=0)
+        .order_by('-comments_count', '-pk')
+        .only('comments_count')[:DEPTH + 1]
+    ]
+    floor = rows[DEPTH][1] if len(rows) > DEPTH else 0
+    top = {
+        'entries': [(pk, count) for pk, count in rows if count > floor],
+        'floor': floor,
+    }
+    cache.set(CACHE_KEY, top, TIMEOUT)
+    if cache.get(CLAIM_KEY) != claim:
+        _drop()
+    return top
+
+
+def _store(entries, floor):
+    leaders = _sorted(entries)
+    for pk, count in leaders[DEPTH:]:
+        floor = max(floor, count)
+    leaders = [(pk, count) for pk, count in leaders[:DEPTH] if count > floor]
+    if floor and len(leaders) < SIZE:
+        _drop()
+    else:
+        cache.set(CACHE_KEY, {'entries': leaders, 'floor': floor}, TIMEOUT)
+        page_cache.bump(SCOPE)
+
+
+def update(post_id, count):
+    """Move a post whose number of comments changed to ``count``."""
+    def edit(top):
+        entries = dict(top['entries'])
+        if count > top['floor']:
+            entries[post_id] = count
+        else:
+            entries.pop(post_id, None)
+        _store(entries, top['floor'])
+    _change(edit)
+
+
+def remove(post_id):
+    def edit(top):
+        entries = dict(top['entries'])
+        if entries.pop(post_id, None) is not None:
+            _store(entries, top['floor'])
+    _change(edit)
+
+
+def shows(post_id):
+    """Whether the widget may show the post, ``True`` when unknown."""
+    top = cache.get(CACHE_KEY)
+    return top is None or post_id in dict(top['entries'][:SIZE])
+
+
+def load():
+    """Posts of the top, best first."""
+    top = cache.get(CACHE_KEY) or rebuild()
+    ids = [pk for pk, count in top['entries'][:SIZE]]
+    posts = (
+        Post.objects.scatter().select_related('author', 'group')
+        .in_bulk(ids)
+    )
+    return [posts[pk] for pk in ids if pk in posts]
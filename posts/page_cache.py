@@ -0,0 +1,135 @@
+"""Full-page cache of the pages anonymous readers see.
+
+A page is stored under its url plus the versions of the scopes it was
+built from: ``site`` for the sidebar and the top widget every page
+shows, and the scopes its view declares, like ``feed``,
+``group:<slug>``, ``author:<username>`` and ``post:<id>``. Signals bump
+exactly the scopes a write touches, so a cached page is never read
+again once anything on it changed. Logged in users, other methods and
+responses that set cookies are never cached.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from . import metrics
+from .models import Post, User
+
+SITE = 'site'
+HEADER = 'X-Page-Cache'
+
+
+def _version_key(scope):
+    return f'posts:page_version:{scope}'
+
+
+def _set_versions(keys):
+    version = time.time_ns()
+    cache.set_many({key: version for key in keys}, None)
+
+
+def bump(*scopes):
+    """Invalidate every page built from any of ``scopes``.
+
+    Versions are bumped again once the transaction commits, so a page
+    rendered from the old rows in between is not served either.
+    """
+    keys = [_version_key(scope) for scope in scopes if scope]
+    if keys:
+        _set_versions(keys)
+        transaction.on_commit(lambda: _set_versions(keys))
+
+
+def post_scopes(post):
+    """Scopes of the pages that show ``post``."""
+    scopes = ['feed', f'post:{post.pk}', f'author:{post.author.username}']
+    if post.group_id:
+        scopes.append(f'group:{post.group.slug}')
+    return scopes
+
+
+def image_changed(name):
+    """Drop the pages showing an image whose resized files appeared."""
+    posts = (
+        Post.objects.scatter().filter(image=name)
+        .select_related('author', 'group')
+    )
+    scopes = [scope for post in posts for scope in post_scopes(post)]
+    scopes.extend(
+        f'author:{username}' for username in
+        User.objects.filter(avatar=name).values_list('username', flat=True)
+    )
+    bump(*scopes)
+
+
+def versions(*scopes):
+    """Current version tokens of ``scopes``, created when missing."""
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    tokens = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        tokens.append(str(found[key]))
+    return tokens
+
+
+def versioned_key(prefix, *scopes):
+    """Cache key that changes whenever ``site`` or ``scopes`` change."""
+    return ':'.join([prefix, *versions(SITE, *scopes)])
+
+
+def _cacheable(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def cache_anonymous(*scopes):
+    """Cache a view for anonymous readers.
+
+    ``scopes`` are formatted with the view kwargs, e.g.
+    ``cache_anonymous('author:{username}', 'post:{post_id}')``.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+            page_scopes = [SITE] + [scope.format(**kwargs) for scope in scopes]
+            url = hashlib.md5(
+                request.build_absolute_uri().encode()
+            ).hexdigest()
+            version = ':'.join(versions(*page_scopes))
+            # Fragment caches of the page vary on it as well.
+            request.page_cache_version = version
+            key = f'posts:page:{url}:{version}'
+            cached = cache.get(key)
+            metrics.inc('cache_requests_total', cache='page',
+                        result='miss' if cached is None else 'hit')
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response[HEADER] = 'hit'
+                return response
+            response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_USED')
+            ):
+                cache.set(
+                    key, (response.content, response['Content-Type']),
+                    settings.PAGE_CACHE_TIMEOUT,
+                )
+                response[HEADER] = 'miss'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from . import tiered_cache
+
+
+def encode_cursor(post):
+    """Pack the ``(pub_date, id)`` key of a post into an url-safe token."""
+    key = f'{post.pub_date.isoformat()}|{post.pk}'
+    return urlsafe_base64_encode(force_bytes(key))
+
+
+def decode_cursor(token):
+    """Unpack a token made by ``encode_cursor``, ``None`` if it is broken."""
+    if not token:
+        return None
+    try:
+        pub_date, pk = urlsafe_base64_decode(token).decode().split('|')
+        pub_date, pk = parse_datetime(pub_date), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset paginator for post feeds ordered by ``(-pub_date, -id)``.
+
+    Every page is a single range read ``WHERE (pub_date, id) < cursor``
+    limited to ``per_page + 1`` rows, so there is no ``COUNT(*)`` and no
+    ``OFFSET`` scan and page 500 costs the same as page 1.
+    The paginator only knows the window around the page it served last,
+    which is all ``Page`` and ``includes/paginator.html`` need.
+    Bare ``?page=N`` links without a cursor still work through ``OFFSET``.
+    With a ``cache_key`` the rows of a page are read through
+    ``tiered_cache``, the key must change whenever the feed does.
+    """
+
+    def __init__(self, object_list, per_page, cache_key=None, **kwargs):
+        super().__init__(
+            object_list.order_by('-pub_date', '-pk'), per_page, **kwargs
+        )
+        self.cache_key = cache_key
+        self.number = 1
+        self.has_next = False
+        self.object_count = 0
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    @property
+    def count(self):
+        """Lower bound of the feed size, known without ``COUNT(*)``."""
+        count = (self.number - 1) * self.per_page + self.object_count
+        return count + 1 if self.has_next else count
+
+    @property
+    def num_pages(self):
+        return self.number + 1 if self.has_next else self.number
+
+    @property
+    def page_range(self):
+        return range(max(self.number - 1, 1), self.num_pages + 1)
+
+    def page(self, number):
+        return self.get_page(number)
+
+    def get_page(self, number, after=None, before=None):
+        """Return the page after or before a cursor.
+
+        ``number`` is only used for display and for the ``OFFSET``
+        fallback when no valid cursor was passed.
+        """
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        if decode_cursor(before) is None:
+            before = None
+        if before is not None or decode_cursor(after) is None:
+            after = None
+        if self.cache_key is None:
+            rows, number, self.has_next = self._window(number, after, before)
+        else:
+            rows, number, self.has_next = tiered_cache.fetch(
+                f'{self.cache_key}:{number}:{after}:{before}',
+                lambda: self._window(number, after, before),
+                settings.FEED_CACHE_TIMEOUT,
+            )
+        self.number = number
+        self.object_count = len(rows)
+        self.next_cursor = encode_cursor(rows[-1]) if rows else None
+        self.previous_cursor = encode_cursor(rows[0]) if rows else None
+        return Page(rows, number, self)
+
+    def _window(self, number, after, before):
+        """``(rows, number, has_next)`` of the page around a cursor."""
+        after, before = decode_cursor(after), decode_cursor(before)
+        limit = self.per_page + 1
+        if before is not None:
+            pub_date, pk = before
+            newer = self.object_list.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+            )
+            rows = list(newer.reverse()[:limit])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return rows, max(number, 2) if has_previous else 1, True
+        if after is not None:
+            pub_date, pk = after
+            older = self.object_list.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+            rows = list(older[:limit])
+            number = max(number, 2)
+        else:
+            offset = (number - 1) * self.per_page
+            rows = list(self.object_list[offset:offset + limit])
+            if not rows and number > 1:
+                return self._window(1, None, None)
+        return rows[:self.per_page], number, len(rows) > self.per_page
+
+    def page_params(self, number):
+        """GET params of a page link, with a cursor for the neighbours."""
+        if number == self.number + 1 and self.has_next:
+            return {'page': number, 'after': self.next_cursor}
+        if number == self.number - 1 and number > 1:
+            return {'page': number, 'before': self.previous_cursor}
+        return {'page': number}
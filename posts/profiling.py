@@ -0,0 +1,99 @@
+"""cProfile of single requests, on demand or sampled.
+
+``ProfilingMiddleware`` profiles the whole request, context processors
+and template rendering included, when it carries an ``X-Profile``
+header signed by ``token()`` or falls into the ``PROFILING_SAMPLE_RATE``
+share of requests. Every profile is dumped in pstats format, which
+snakeviz, flameprof and gprof2dot read, into ``PROFILING_DIR``. The
+directory is a ring of at most ``PROFILING_RING_SIZE`` dumps, the
+oldest are removed first. ``manage.py profile_report`` sums the dumps
+per view.
+"""
+import cProfile
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core import signing
+
+HEADER = 'HTTP_X_PROFILE'
+SALT = 'posts.profiling'
+SUFFIX = '.prof'
+
+
+def token():
+    """Value of the ``X-Profile`` header that asks for a profile."""
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def _signed(value):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            value, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def dumps(view=None):
+    """Paths of the dumps in the ring, oldest first, of one view or all."""
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        if not name.endswith(SUFFIX):
+            continue
+        if view is not None and view_of(name) != view:
+            continue
+        found.append(os.path.join(settings.PROFILING_DIR, name))
+    return sorted(found, key=os.path.basename)
+
+
+def view_of(path):
+    """Url name a dump was written for."""
+    name = os.path.basename(path)[:-len(SUFFIX)]
+    return name.split('-', 2)[2].replace('.', ':')
+
+
+def _trim():
+    for path in dumps()[:-settings.PROFILING_RING_SIZE]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def wanted(self, request):
+        value = request.META.get(HEADER)
+        if value:
+            return _signed(value)
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.wanted(request):
+            return self.get_response(request)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        # Sorting the names by their nanosecond prefix orders the ring.
+        name = (f'{time.time_ns():020d}-{os.getpid()}-'
+                f'{view.replace(":", ".")}{SUFFIX}')
+        profile.dump_stats(os.path.join(settings.PROFILING_DIR, name))
+        _trim()
+        response['X-Profile-Dump'] = name
+        return response
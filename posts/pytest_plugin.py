@@ -0,0 +1,29 @@
+"""Fail every test whose requests exceed a view's ``@query_budget``.
+
+Enabled with ``pytest_plugins = ['posts.pytest_plugin']``; pass
+``--no-query-budget`` to only measure.
+"""
+import pytest
+
+from posts import query_budget
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--no-query-budget', action='store_true',
+        help='Do not fail tests whose requests exceed a view query budget',
+    )
+
+
+def _describe(violation):
+    statements = '\n'.join(f'    {sql}' for sql in violation.sql)
+    return (f'{violation.path} ({violation.view}) ran {violation.queries} '
+            f'queries, its budget is {violation.budget}:\n{statements}')
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budget(request):
+    with query_budget.collect() as violations:
+        yield violations
+    if violations and not request.config.getoption('--no-query-budget'):
+        pytest.fail('\n'.join(map(_describe, violations)), pytrace=False)
@@ -0,0 +1,104 @@
+"""SQL query count and time of every request, checked against budgets.
+
+``QueryBudgetMiddleware`` counts the queries and database time of every
+request through ``connection.execute_wrapper``, so it works without
+``DEBUG``. The numbers are summed per resolved url name in ``stats()``
+and, in debug mode, sent back in the ``X-Query-Count`` and
+``X-Query-Time`` headers. Views declare their budget with
+``@query_budget(n)``; a request above it is logged, and fails the test
+that made it when ``posts.pytest_plugin`` is active.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+Violation = namedtuple('Violation', 'view path queries budget sql')
+
+_lock = threading.Lock()
+_stats = {}
+_collectors = []
+
+
+def query_budget(limit):
+    """Declare the most queries one request to the view may run."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def stats():
+    """``{url name: (requests, queries, seconds)}`` of this process."""
+    with _lock:
+        return {name: tuple(row) for name, row in _stats.items()}
+
+
+@contextmanager
+def collect():
+    """List filled with the budget violations of the enclosed requests."""
+    violations = []
+    with _lock:
+        _collectors.append(violations)
+    try:
+        yield violations
+    finally:
+        with _lock:
+            _collectors.remove(violations)
+
+
+class _Recorder:
+    # Called from the shard pool threads of the request as well.
+    def __init__(self):
+        self.statements = []
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.seconds += time.perf_counter() - started
+                self.statements.append(sql)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = _Recorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        queries = len(recorder.statements)
+        with _lock:
+            row = _stats.setdefault(match.view_name, [0, 0, 0.0])
+            row[0] += 1
+            row[1] += queries
+            row[2] += recorder.seconds
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(queries)
+            response['X-Query-Time'] = f'{recorder.seconds * 1000:.1f}ms'
+        budget = getattr(match.func, 'query_budget', None)
+        if budget is not None and queries > budget:
+            logger.warning('%s ran %d queries, its budget is %d',
+                           request.path, queries, budget)
+            violation = Violation(match.view_name, request.path, queries,
+                                  budget, recorder.statements)
+            with _lock:
+                for violations in _collectors:
+                    violations.append(violation)
+        return response
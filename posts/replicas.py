@@ -0,0 +1,114 @@
+"""Reads of the busy pages from read-only replicas.
+
+``ReplicaRouter`` sends every write to ``default``. Reads go to
+``default`` as well, except inside views marked ``@replica_reads``: the
+feeds, profile, post and search pages read from one of
+``DATABASE_REPLICAS``, chosen once per request so a page sees a single
+snapshot. A request that runs an ``INSERT``, ``UPDATE`` or ``DELETE`` on
+the primary pins the browser, through a cookie, and a logged in user,
+through the cache, to the primary for ``REPLICA_PIN_SECONDS``, long
+enough for the replicas to catch up. A new post, comment or follow is
+always visible to the one who made it.
+"""
+import functools
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+PIN_COOKIE = 'primary_pin'
+PRIMARY = 'default'
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_local = threading.local()
+
+
+def _pin_key(user_id):
+    return f'posts:primary_pin:{user_id}'
+
+
+def pinned(request):
+    """Whether the reads of ``request`` must see its user's writes."""
+    if PIN_COOKIE in request.COOKIES:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated
+                and cache.get(_pin_key(user.pk)))
+
+
+@contextmanager
+def use_replica():
+    """Route the enclosed reads to one replica, if there are any."""
+    replicas = settings.DATABASE_REPLICAS
+    previous = getattr(_local, 'replica', None)
+    _local.replica = random.choice(replicas) if replicas else None
+    try:
+        yield _local.replica
+    finally:
+        _local.replica = previous
+
+
+def replica_reads(view):
+    """Let ``view`` read from a replica unless the reader is pinned."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if pinned(request):
+            return view(request, *args, **kwargs)
+        with use_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return getattr(_local, 'replica', None) or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, see sync_replicas.
+        return db == PRIMARY
+
+
+class ReplicaPinMiddleware:
+    """Pin the browser and the user of a request that wrote to the
+    primary.
+
+    Goes before the session middleware, which writes on the way out.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        wrote = []
+
+        def watch(execute, sql, params, many, context):
+            if sql.lstrip()[:7].upper().startswith(WRITES):
+                wrote.append(sql)
+            return execute(sql, params, many, context)
+
+        with connections[PRIMARY].execute_wrapper(watch):
+            response = self.get_response(request)
+        if wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(_pin_key(user.pk), 1,
+                          settings.REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,142 @@
+"""Full-text search over posts.
+
+On SQLite the text and the description of every post are mirrored into
+the ``posts_post_fts`` FTS5 table, which is kept in sync by signals and
+ranked with BM25. Other backends fall back to ``icontains``. The index
+lives in the database the router writes posts to without a shard hint,
+which indexes the posts of every shard as well.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from . import shards
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+# BM25 weights of the (text, discription) columns, a hit in the short
+# description means more than a hit somewhere in the text.
+WEIGHTS = (1.0, 2.0)
+
+WORD = re.compile(r'\w+')
+
+
+def _alias():
+    return router.db_for_write(Post)
+
+
+def is_supported(alias=None):
+    return connections[alias or _alias()].vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Turn free user input into a safe FTS5 prefix query."""
+    words = WORD.findall(query or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def index_post(post):
+    alias = _alias()
+    if not is_supported(alias):
+        return
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text, discription) '
+            'VALUES (%s, %s, %s)',
+            [post.pk, post.text, post.discription],
+        )
+
+
+def unindex_post(pk):
+    alias = _alias()
+    if not is_supported(alias):
+        return
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def reindex():
+    """Rebuild the whole index from ``posts_post``, return its size."""
+    with connections[_alias()].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        if shards.enabled():
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, discription) '
+                'VALUES (%s, %s, %s)',
+                list(Post.objects.scatter().order_by()
+                     .values_list('pk', 'text', 'discription')),
+            )
+        else:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, discription) '
+                f'SELECT id, text, discription FROM {Post._meta.db_table}'
+            )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+        )
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+class Ranked:
+    """Ids of the posts matching an FTS5 expression, best matches first.
+
+    Counts and slices run their own query, so a paginator reads one page
+    of ids at a time however many posts match.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.alias = router.db_for_read(Post)
+
+    def _fetch(self, select, tail='', params=()):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(
+                f'SELECT {select} FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s{tail}',
+                [self.expression, *params],
+            )
+            return cursor.fetchall()
+
+    def count(self):
+        return self._fetch('count(*)')[0][0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            raise TypeError('Ranked ids can only be sliced')
+        start = index.start or 0
+        limit = -1 if index.stop is None else max(index.stop - start, 0)
+        rows = self._fetch(
+            'rowid',
+            f' ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s OFFSET %s',
+            [*WEIGHTS, limit, start],
+        )
+        return [row[0] for row in rows]
+
+
+def ranked_ids(query):
+    """Ids of the posts matching ``query``, best matches first."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    if not is_supported(router.db_for_read(Post)):
+        return (
+            Post.objects.filter(
+                Q(text__icontains=query) | Q(discription__icontains=query)
+            ).values_list('pk', flat=True)
+        )
+    return Ranked(expression)
+
+
+def load(ids):
+    """Fetch the posts of one page of ``ranked_ids`` keeping the rank."""
+    posts = (
+        Post.objects.scatter().select_related('author', 'group').in_bulk(ids)
+    )
+    return [posts[pk] for pk in ids if pk in posts]
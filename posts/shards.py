@@ -0,0 +1,335 @@
+"""Posts and comments split across databases by author.
+
+With ``POST_SHARDS`` set every post lives in the shard of its author,
+``POST_SHARDS[author_id % len(POST_SHARDS)]``, and its comments live
+next to it. Users, groups, follows and the rest stay in ``default``.
+``ShardRouter`` places a post or a comment by the instance Django passes
+as a hint, so ``author.posts``, ``post.comments`` and saving or deleting
+either of them touch a single shard. A shard has no users or groups to
+join, there ``select_related()`` becomes ``prefetch_related()`` reading
+them from their own database.
+
+Queries that name no author go through ``Post.objects.scatter()``: the
+query runs on every shard at once in a thread pool and the ordered rows
+are merged k-way, ``Scatter`` filters, reverses and slices like a
+queryset so ``CursorPaginator`` pages over it unchanged. The pool threads
+keep their shard connections open until ``shutdown()`` and run the
+execute wrappers of the calling thread, so the query budget and timing
+of a request count its shard queries too. Without shards
+``scatter()`` is the plain queryset. Other reads without a hint go to
+``default``, which holds no posts then.
+
+Every shard numbers its rows from ``index << ID_BITS``, so post and
+comment ids stay unique across shards and the URLs do not change.
+Shards are created with ``manage.py migrate --database <shard>``, the
+list must not be reordered and adding a shard moves authors.
+"""
+import atexit
+import heapq
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import chain, islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connections, models
+from django.db.models import prefetch_related_objects
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from .timing import phase
+
+SHARDED = ('posts.post', 'posts.comment')
+# Timeline is only there for deleting a post to cascade to, it stays
+# empty: sharded follow feeds are read with a scatter.
+SHARD_MODELS = ('post', 'comment', 'timeline')
+ID_BITS = 40
+
+_executor = None
+_lock = threading.Lock()
+_opened = set()
+
+
+def _forget():
+    """A forked child has none of the pool threads, nor their
+    connections to close."""
+    global _executor, _lock
+    _executor = None
+    _lock = threading.Lock()
+    _opened.clear()
+
+
+os.register_at_fork(after_in_child=_forget)
+
+
+@atexit.register
+def shutdown():
+    """Stop the pool threads and close their shard connections."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown()
+    with _lock:
+        opened = list(_opened)
+        _opened.clear()
+    for connection in opened:
+        connection.close()
+        connection.dec_thread_sharing()
+
+
+def enabled():
+    return bool(settings.POST_SHARDS)
+
+
+def for_author(author_id):
+    """The shard holding the posts of ``author_id``."""
+    shards = settings.POST_SHARDS
+    return shards[author_id % len(shards)]
+
+
+def _shard_of(model, instance):
+    """Shard of the ``model`` rows tied to a hint, ``None`` if unknown."""
+    label = instance._meta.label_lower
+    if label == 'posts.post':
+        if instance.author_id is None:
+            return None
+        return for_author(instance.author_id)
+    if label == 'posts.comment':
+        post = instance._meta.get_field('post').get_cached_value(
+            instance, None
+        )
+        if post is not None:
+            return _shard_of(model, post)
+        return None if instance._state.adding else instance._state.db
+    if (label == settings.AUTH_USER_MODEL.lower()
+            and model._meta.label_lower == 'posts.post'
+            and instance.pk is not None):
+        return for_author(instance.pk)
+    return None
+
+
+class ShardRouter:
+    def db_for_read(self, model, **hints):
+        if not enabled() or model._meta.label_lower not in SHARDED:
+            return None
+        instance = hints.get('instance')
+        return None if instance is None else _shard_of(model, instance)
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Posts and comments point at users and groups of default.
+        if {obj1._state.db, obj2._state.db} & set(settings.POST_SHARDS):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in settings.POST_SHARDS:
+            return None
+        return app_label == 'posts' and model_name in SHARD_MODELS
+
+
+@receiver(post_migrate)
+def number_rows(sender, using, **kwargs):
+    """Start the ids of a shard at ``index << ID_BITS``."""
+    if sender.label != 'posts' or using not in settings.POST_SHARDS:
+        return
+    start = settings.POST_SHARDS.index(using) << ID_BITS
+    with connections[using].cursor() as cursor:
+        for name in ('Post', 'Comment'):
+            table = sender.get_model(name)._meta.db_table
+            # Table rebuilds of the migrations may have left a row.
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = MAX(seq, %s) '
+                'WHERE name = %s', [start, table],
+            )
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                'WHERE NOT EXISTS '
+                '(SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                [table, start, table],
+            )
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(thread_name_prefix='scatter')
+        return _executor
+
+
+def _on_shard(run, queryset, wrappers):
+    """Run in a pool thread on the connection the thread keeps open,
+    wrapped like the connection of the calling thread."""
+    connection = connections[queryset.db]
+    with _lock:
+        if connection not in _opened:
+            # Closed by shutdown() from another thread.
+            connection.inc_thread_sharing()
+            _opened.add(connection)
+    with ExitStack() as stack:
+        for wrapper in wrappers:
+            # Wrappers every connection gets on creation are there.
+            if wrapper not in connection.execute_wrappers:
+                stack.enter_context(connection.execute_wrapper(wrapper))
+        return run(queryset)
+
+
+class Scatter:
+    """A query run on several shards, its ordered rows merged k-way.
+
+    The ordering must go one way for all its fields, which must be
+    attributes of the rows. Unordered rows are simply concatenated.
+    Related objects are prefetched once for the merged rows.
+    """
+
+    def __init__(self, queryset, shards, lookups=()):
+        self.queryset = queryset
+        self.shards = shards
+        self.lookups = lookups
+
+    def _chain(self, queryset, lookups=()):
+        return Scatter(queryset, self.shards, (*self.lookups, *lookups))
+
+    @property
+    def model(self):
+        return self.queryset.model
+
+    @property
+    def ordered(self):
+        return self.queryset.ordered
+
+    def all(self):
+        return self._chain(self.queryset.all())
+
+    def filter(self, *args, **kwargs):
+        return self._chain(self.queryset.filter(*args, **kwargs))
+
+    def exclude(self, *args, **kwargs):
+        return self._chain(self.queryset.exclude(*args, **kwargs))
+
+    def order_by(self, *fields):
+        return self._chain(self.queryset.order_by(*fields))
+
+    def reverse(self):
+        return self._chain(self.queryset.reverse())
+
+    def only(self, *fields):
+        return self._chain(self.queryset.only(*fields))
+
+    def values(self, *fields):
+        return self._chain(self.queryset.values(*fields))
+
+    def annotate(self, *args, **kwargs):
+        return self._chain(self.queryset.annotate(*args, **kwargs))
+
+    def values_list(self, *fields, **kwargs):
+        return self._chain(self.queryset.values_list(*fields, **kwargs))
+
+    def select_related(self, *fields):
+        return self._chain(self.queryset, fields)
+
+    prefetch_related = select_related
+
+    def _gather(self, run):
+        """``run(queryset)`` on every shard, in parallel if there are more."""
+        querysets = [self.queryset.using(alias) for alias in self.shards]
+        if len(querysets) < 2:
+            return [run(queryset) for queryset in querysets]
+        wrappers = {
+            queryset.db: list(connections[queryset.db].execute_wrappers)
+            for queryset in querysets
+        }
+        with phase('db'):
+            return list(_get_executor().map(
+                lambda queryset: _on_shard(run, queryset,
+                                           wrappers[queryset.db]),
+                querysets,
+            ))
+
+    def _merge(self, results):
+        query = self.queryset.query
+        ordering = query.order_by or (
+            query.default_ordering and query.get_meta().ordering
+        )
+        if not ordering:
+            return list(chain.from_iterable(results))
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) > 1:
+            raise ValueError(f'Cannot merge rows ordered by {ordering}')
+        rows = heapq.merge(
+            *results,
+            key=attrgetter(*(field.lstrip('-') for field in ordering)),
+            reverse=descending.pop() == query.standard_ordering,
+        )
+        return list(rows)
+
+    def _rows(self, stop=None):
+        rows = self._merge(self._gather(
+            lambda queryset: list(
+                queryset if stop is None else queryset[:stop]
+            )
+        ))
+        if self.lookups:
+            prefetch_related_objects(rows, *self.lookups)
+        return rows
+
+    def __iter__(self):
+        return iter(self._rows())
+
+    def __len__(self):
+        return len(self._rows())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(islice(self._rows(key.stop), key.start, key.stop))
+        return self._rows(key + 1)[key]
+
+    def count(self):
+        return sum(self._gather(lambda queryset: queryset.count()))
+
+    def exists(self):
+        return any(self._gather(lambda queryset: queryset.exists()))
+
+    def in_bulk(self, id_list):
+        found = {}
+        for posts in self._gather(
+                lambda queryset: queryset.in_bulk(id_list)):
+            found.update(posts)
+        if self.lookups:
+            prefetch_related_objects(list(found.values()), *self.lookups)
+        return found
+
+
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        """Save where the router puts the new row, not in ``self.db``."""
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True)
+        return obj
+
+    def select_related(self, *fields):
+        if fields != (None,) and self.db in settings.POST_SHARDS:
+            return self.prefetch_related(*fields)
+        return super().select_related(*fields)
+
+
+class ShardedManager(models.Manager.from_queryset(ShardedQuerySet)):
+    def scatter(self, authors=None):
+        """Rows of every shard, or of the shards of ``authors`` only."""
+        queryset = self.get_queryset()
+        if authors is not None:
+            authors = list(authors)
+            queryset = queryset.filter(author_id__in=authors)
+        if not enabled():
+            return queryset
+        if authors is None:
+            return Scatter(queryset, settings.POST_SHARDS)
+        return Scatter(queryset, sorted({for_author(pk) for pk in authors}))
@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import (
+    cards, groups, images, most_commented, page_cache, search, shards,
+    timeline
+)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    # Sharded follow feeds are read with a scatter, see follow_index.
+    if created and not shards.enabled():
+        timeline.push(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, created, **kwargs):
+    search.index_post(instance)
+    if instance.group_id or not created:
+        groups.invalidate()
+    if not created:
+        cards.bump('post', instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+    most_commented.remove(instance.pk)
+    if instance.group_id:
+        groups.invalidate()
+
+
+@receiver(pre_save, sender=Post)
+def drop_old_group_page(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    # Read apart, the post may be on a shard without groups. The old
+    # image is kept for discard_replaced_variants.
+    group_id, instance._old_image = (
+        Post.objects.using(instance._state.db).filter(pk=instance.pk)
+        .values_list('group_id', 'image').first() or (None, None)
+    )
+    slug = (
+        Group.objects.filter(pk=group_id)
+        .values_list('slug', flat=True).first()
+    )
+    if slug:
+        page_cache.bump(f'group:{slug}')
+
+
+@receiver(post_save, sender=Post)
+def discard_replaced_variants(sender, instance, using, **kwargs):
+    old = instance.__dict__.pop('_old_image', None)
+    if old and old != instance.image.name:
+        transaction.on_commit(lambda: images.discard(old), using=using)
+
+
+@receiver(post_delete, sender=Post)
+def discard_deleted_variants(sender, instance, using, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: images.discard(name), using=using)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def drop_post_pages(sender, instance, created=False, **kwargs):
+    scopes = page_cache.post_scopes(instance)
+    if instance.group_id or not created:
+        scopes.append(page_cache.SITE)
+    page_cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def drop_group_list(sender, instance, **kwargs):
+    groups.invalidate()
+    cards.bump('group', instance.pk)
+    page_cache.bump(page_cache.SITE)
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_rows(sender, instance, using, **kwargs):
+    # The cascade in default can not see the posts and comments of the
+    # shards.
+    if not shards.enabled() or using in settings.POST_SHARDS:
+        return
+    for alias in settings.POST_SHARDS:
+        Comment.objects.using(alias).filter(author=instance).delete()
+    Post.objects.using(shards.for_author(instance.pk)).filter(
+        author=instance
+    ).delete()
+
+
+@receiver(pre_delete, sender=Group)
+def ungroup_sharded_posts(sender, instance, using, **kwargs):
+    if not shards.enabled() or using in settings.POST_SHARDS:
+        return
+    for alias in settings.POST_SHARDS:
+        Post.objects.using(alias).filter(group=instance).update(group=None)
+
+
+@receiver(post_save, sender=User)
+def drop_author_cards(sender, instance, created, update_fields=None,
+                      **kwargs):
+    if created or update_fields == frozenset(['last_login']):
+        return
+    cards.bump('author', instance.pk)
+    page_cache.bump(page_cache.SITE)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created and not shards.enabled():
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    if not shards.enabled():
+        timeline.drop(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def drop_follow_pages(sender, instance, **kwargs):
+    usernames = {}
+    for name in ('user', 'author'):
+        user = Follow._meta.get_field(name).get_cached_value(instance, None)
+        if user is not None:
+            usernames[user.pk] = user.username
+    missing = {instance.user_id, instance.author_id} - set(usernames)
+    if missing:
+        usernames.update(
+            User.objects.filter(pk__in=missing).values_list('pk', 'username')
+        )
+    page_cache.bump(*(f'author:{name}' for name in usernames.values()))
+
+
+def _comments_count_changed(post_id, using):
+    post = (
+        Post.objects.using(using).select_related('author', 'group')
+        .filter(pk=post_id).first()
+    )
+    cards.bump('post', post_id)
+    shown = most_commented.shows(post_id)
+    if post is None:
+        most_commented.remove(post_id)
+        return
+    most_commented.update(post_id, post.comments_count)
+    scopes = page_cache.post_scopes(post)
+    if shown or most_commented.shows(post_id):
+        scopes.append(page_cache.SITE)
+    page_cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, using, **kwargs):
+    if created:
+        Post.objects.using(using).filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1
+        )
+        _comments_count_changed(instance.post_id, using)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, using, **kwargs):
+    Post.objects.using(using).filter(
+        pk=instance.post_id, comments_count__gt=0
+    ).update(comments_count=F('comments_count') - 1)
+    _comments_count_changed(instance.post_id, using)
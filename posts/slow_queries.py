@@ -0,0 +1,124 @@
+"""Log of the database queries slower than ``SLOW_QUERY_THRESHOLD_MS``.
+
+Every connection gets an execute wrapper when it is opened, so requests,
+management commands and the thumbnail workers are all covered. A slow
+query is logged to the ``posts.slow_queries`` logger as one JSON line:
+its normalized SQL and fingerprint, a fingerprint of the parameters, the
+duration, ``EXPLAIN QUERY PLAN`` of selects and where it came from, the
+innermost frame of the project and the template line being rendered.
+``manage.py slow_queries`` sums the log per fingerprint.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import django.db
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_DJANGO_DB = os.path.dirname(django.db.__file__)
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """SQL with literals and ``IN`` lists collapsed, to group queries."""
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _LITERALS.sub('?', sql)
+
+
+def fingerprint(text):
+    return hashlib.md5(text.encode()).hexdigest()[:12]
+
+
+def _project_frame(path):
+    return (path.startswith(settings.BASE_DIR)
+            and 'site-packages' not in path
+            and path != __file__)
+
+
+def call_site():
+    """``(file:line in function, template:line)`` that ran the query.
+
+    The code site is the last project frame before the stack enters
+    ``django.db``, the template the innermost node being rendered.
+    """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    site = template = None
+    for frame in frames:
+        path = frame.f_code.co_filename
+        if path.startswith(_DJANGO_DB):
+            break
+        if _project_frame(path):
+            site = (f'{os.path.relpath(path, settings.BASE_DIR)}:'
+                    f'{frame.f_lineno} in {frame.f_code.co_name}')
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name}:{token.lineno}'
+    return site, template
+
+
+def explain(connection, sql, params):
+    """Query plan lines of a select, empty for other statements."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return []
+    prefix = ('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+              else 'EXPLAIN ')
+    try:
+        with connection.cursor() as cursor:
+            # The backend cursor, execute wrappers do not see the plan.
+            cursor.cursor.execute(prefix + sql, params)
+            rows = cursor.cursor.fetchall()
+    except Exception:
+        return []
+    return [str(row[-1]) for row in rows]
+
+
+def _log(execute, sql, params, many, context):
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if (threshold is None or duration * 1000 < threshold
+            or not logger.isEnabledFor(logging.WARNING)):
+        return result
+    normalized = normalize(sql)
+    site, template = call_site()
+    logger.warning(json.dumps({
+        'time': timezone.now().isoformat(),
+        'alias': context['connection'].alias,
+        'duration_ms': round(duration * 1000, 2),
+        'fingerprint': fingerprint(normalized),
+        'sql': normalized,
+        'params': fingerprint(repr(params)),
+        'many': many,
+        'plan': [] if many else explain(context['connection'], sql, params),
+        'site': site,
+        'template': template,
+    }, ensure_ascii=False))
+    return result
+
+
+@receiver(connection_created)
+def watch(sender, connection, **kwargs):
+    if _log not in connection.execute_wrappers:
+        # First, execute_wrapper() blocks that are open pop from the end.
+        connection.execute_wrappers.insert(0, _log)
@@ -0,0 +1,62 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+from posts import cards, images
+
+register = template.Library()
+
+PAGE_PARAMS = ('page', 'after', 'before')
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, page, number):
+    """Query string of a page link that keeps the other GET params."""
+    params = context['request'].GET.copy()
+    for key in PAGE_PARAMS:
+        params.pop(key, None)
+    paginator = page.paginator
+    if hasattr(paginator, 'page_params'):
+        page_params = paginator.page_params(number)
+    else:
+        page_params = {'page': number}
+    for key, value in page_params.items():
+        params[key] = str(value)
+    return params.urlencode()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Post card from the fragment cache with the owner links spliced in."""
+    return cards.render(post, context.get('user'))
+
+
+@register.simple_tag
+def prefetch_cards(posts):
+    """Load the images of the uncached cards of ``posts`` in bulk."""
+    cards.prefetch(posts)
+    return ''
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', css_class='', alt=''):
+    """``<picture>`` over the image variants, empty until they are built."""
+    variants = images.variants(image)
+    if not variants:
+        return ''
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (mime_type, _srcset(variants[mime_type]), sizes)
+            for _, mime_type, _, _ in images.FORMATS
+            if mime_type in variants and mime_type != 'image/jpeg'
+        ),
+    )
+    fallback = variants.get('image/jpeg') or next(iter(variants.values()))
+    return format_html(
+        '<picture>{}<img class="{}" src="{}" srcset="{}" sizes="{}" '
+        'alt="{}" loading="lazy"></picture>',
+        sources, css_class, fallback[-1][0], _srcset(fallback), sizes, alt,
+    )
+
+
+def _srcset(urls):
+    return ', '.join(f'{url} {width}w' for url, width in urls)
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from twitter_killer.asgi import application
+from twitter_killer.handlers import ASGIHandler
+
+User = get_user_model()
+
+
+def call(app, scope, messages):
+    """Run ``app`` on ``scope``, fed ``messages``, and return what it
+    sent."""
+    incoming = list(messages)
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+def http(path, query_string=b'', headers=(), method='GET'):
+    return {
+        'type': 'http', 'method': method, 'path': path,
+        'query_string': query_string, 'headers': list(headers),
+        'http_version': '1.1', 'scheme': 'http',
+        'server': ('testserver', 80), 'client': ('10.0.0.1', 5000),
+    }
+
+
+class HandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.seen = []
+        self.handler = ASGIHandler(self.wsgi, threads=2)
+
+    def wsgi(self, environ, start_response):
+        self.seen.append((dict(environ), environ['wsgi.input'].read(),
+                          threading.current_thread().name))
+        start_response('201 Created', [('Content-Type', 'text/plain'),
+                                       ('X-Thread', 'yes')])
+        return [b'hello ', b'world']
+
+    def test_request_is_passed_as_a_wsgi_environ(self):
+        sent = call(self.handler, http(
+            '/профиль/', b'page=2',
+            [(b'content-type', b'text/plain'), (b'cookie', b'a=1'),
+             (b'cookie', b'b=2'), (b'x-forwarded-for', b'1.2.3.4')],
+            method='POST',
+        ), [
+            {'type': 'http.request', 'body': b'first ', 'more_body': True},
+            {'type': 'http.request', 'body': b'second'},
+        ])
+        environ, body, thread = self.seen[0]
+        self.assertEqual(body, b'first second')
+        self.assertTrue(thread.startswith('asgi'))
+        self.assertEqual(environ['REQUEST_METHOD'], 'POST')
+        self.assertEqual(
+            environ['PATH_INFO'].encode('latin-1').decode('utf-8'),
+            '/профиль/',
+        )
+        self.assertEqual(environ['QUERY_STRING'], 'page=2')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(environ['HTTP_X_FORWARDED_FOR'], '1.2.3.4')
+        self.assertEqual(environ['REMOTE_ADDR'], '10.0.0.1')
+        self.assertEqual(sent, [
+            {'type': 'http.response.start', 'status': 201,
+             'headers': [(b'content-type', b'text/plain'),
+                         (b'x-thread', b'yes')]},
+            {'type': 'http.response.body', 'body': b'hello world'},
+        ])
+
+    def test_client_gone_before_the_body_skips_the_view(self):
+        sent = call(self.handler, http('/'), [
+            {'type': 'http.request', 'body': b'part', 'more_body': True},
+            {'type': 'http.disconnect'},
+        ])
+        self.assertEqual(sent, [])
+        self.assertEqual(self.seen, [])
+
+    def test_lifespan_stops_the_threads(self):
+        call(self.handler, http('/'), [{'type': 'http.request'}])
+        self.assertIsNotNone(self.handler.executor)
+        sent = call(self.handler, {'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'},
+        ])
+        self.assertEqual(sent, [{'type': 'lifespan.startup.complete'},
+                                {'type': 'lifespan.shutdown.complete'}])
+        self.assertIsNone(self.handler.executor)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ApplicationTests(TransactionTestCase):
+    def test_serves_the_profile(self):
+        User.objects.create(username='author', avatar='avatars/author.jpg')
+        sent = call(application, http(
+            reverse('posts:profile', args=['author'])
+        ), [{'type': 'http.request'}])
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'author', sent[1]['body'])
@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from posts import benchmark
+from posts.models import Comment, Group, Post, Timeline, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed(users=5, groups=2, posts=40, comments=30, follows=6)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_fills_derived_tables(self):
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)),
+            Comment.objects.count(),
+        )
+        self.assertTrue(Timeline.objects.exists())
+        self.assertFalse(Post.objects.filter(content_hash='').exists())
+
+    def test_every_route_answers(self):
+        reader = User.objects.order_by('pk').first()
+        self.client.force_login(reader)
+        for route in benchmark.routes(reader):
+            with self.subTest(route=route.name):
+                send = (self.client.post if route.method == 'POST'
+                        else self.client.get)
+                response = send(*route.target())
+                self.assertIn(response.status_code, (200, 302))
+
+    def test_anonymous_pages_miss_the_page_cache_unless_cached(self):
+        routes = {route.name: route
+                  for route in benchmark.routes(User.objects.first())}
+        self.assertNotEqual(routes['index'].target(),
+                            routes['index'].target())
+        self.client.get(routes['index'].target()[0])
+        response = self.client.get(routes['index'].target()[0])
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.client.get(routes['index cached'].target()[0])
+        response = self.client.get(routes['index cached'].target()[0])
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    def test_routes_without_a_group_or_author_are_left_out(self):
+        reader = User.objects.order_by('pk').first()
+        Group.objects.all().delete()
+        Post.objects.exclude(author=reader).delete()
+        names = {route.name for route in benchmark.routes(reader)}
+        self.assertIn('index', names)
+        self.assertIn('new_post', names)
+        for name in ('group_posts', 'profile', 'post', 'add_comment'):
+            self.assertNotIn(name, names)
+
+    def test_summary(self):
+        stats = benchmark.summarize([i / 1000 for i in range(1, 101)],
+                                    [2, 4], [10, 30], errors=0)
+        self.assertEqual((stats.p50, stats.p95, stats.p99), (50, 95, 99))
+        self.assertEqual((stats.queries, stats.bytes), (3, 20))
+
+
+class CommandArgumentTests(SimpleTestCase):
+    def test_requests_must_be_positive(self):
+        with self.assertRaisesMessage(CommandError, 'must be at least 1'):
+            call_command('benchmark', '--requests', '0')
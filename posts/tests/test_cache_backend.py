@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from twitter_killer.cache import SQLiteCache
+
+
+def _set_in_child(path):
+    SQLiteCache(path, {}).set('from_child', 'value')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.backend()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def backend(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_set_get_and_expire(self):
+        self.cache.set('key', {'a': 1})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+        self.cache.set('short', 'value', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('short', 'default'), 'default')
+
+    def test_add_only_missing_or_expired(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache.set('old', 1, 0.01)
+        time.sleep(0.02)
+        self.assertTrue(self.cache.add('old', 2))
+        self.assertEqual(self.cache.get('old'), 2)
+
+    def test_incr_and_decr(self):
+        self.cache.set('counter', 10)
+        self.assertEqual(self.cache.incr('counter'), 11)
+        self.assertEqual(self.cache.decr('counter', 5), 6)
+        self.cache.set('float', 1.5)
+        self.assertEqual(self.cache.incr('float'), 2.5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_get_many_and_set_many(self):
+        cache = self.backend(MAX_ENTRIES=2000)
+        data = {f'key{number}': number for number in range(1200)}
+        self.assertEqual(cache.set_many(data), [])
+        self.assertEqual(cache.get_many([*data, 'missing']), data)
+        cache.delete_many(['key0', 'key1'])
+        self.assertEqual(cache.get_many(['key0', 'key1', 'key2']),
+                         {'key2': 2})
+
+    def test_least_recently_read_are_evicted(self):
+        cache = self.backend(MAX_ENTRIES=3, CULL_FREQUENCY=3,
+                             LRU_RESOLUTION=0)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+            time.sleep(0.01)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']),
+                         {'a': 'a', 'c': 'c', 'd': 'd'})
+
+    def test_size_bound(self):
+        cache = self.backend(MAX_BYTES=10000)
+        for number in range(10):
+            cache.set(f'key{number}', 'x' * 2000)
+        stored = cache.get_many([f'key{number}' for number in range(10)])
+        self.assertLessEqual(len(stored), 5)
+        self.assertIn('key9', stored)
+
+    def test_shared_between_processes(self):
+        self.cache.set('from_parent', 'value')
+        process = multiprocessing.get_context('spawn').Process(
+            target=_set_in_child, args=(self.path,)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get('from_child'), 'value')
+        self.assertEqual(self.backend().get('from_parent'), 'value')
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import cards
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PostCardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='test_user')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Test group', slug='test-slug')
+        cls.post = Post.objects.create(text='test text', author=cls.user,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def card(self, user=None):
+        post = Post.objects.select_related('author', 'group').get(
+            pk=PostCardTests.post.pk
+        )
+        return cards.render(post, user)
+
+    def test_card_is_cached_and_owner_links_spliced(self):
+        self.card()
+        with self.assertNumQueries(0):
+            cards.render(PostCardTests.post, PostCardTests.reader)
+        edit_url = reverse('posts:post_edit', kwargs={
+            'username': 'test_user', 'post_id': PostCardTests.post.pk
+        })
+        self.assertNotIn(edit_url, self.card(PostCardTests.reader))
+        self.assertIn(edit_url, self.card(PostCardTests.user))
+
+    def test_writes_bump_version(self):
+        self.card()
+        Comment.objects.create(post=PostCardTests.post,
+                               author=PostCardTests.reader, text='comment')
+        self.assertIn('Комментариев: 1', self.card())
+        group = Group.objects.get(pk=PostCardTests.group.pk)
+        group.title = 'Renamed group'
+        group.save()
+        self.assertIn('#Renamed group', self.card())
+        post = Post.objects.get(pk=PostCardTests.post.pk)
+        post.discription = 'New title'
+        post.save()
+        self.assertIn('New title', self.card())
+
+    def test_page_reads_cached_cards_at_once(self):
+        for number in range(3):
+            Post.objects.create(text=f'post {number}',
+                                author=PostCardTests.user)
+        posts = list(Post.objects.select_related('author', 'group'))
+        for post in posts:
+            cards.render(post, None)
+        with mock.patch.object(cache, 'get', wraps=cache.get) as get, \
+                mock.patch.object(cache, 'get_many',
+                                  wraps=cache.get_many) as get_many:
+            cards.prefetch(posts)
+            rendered = [cards.render(post, None) for post in posts]
+        self.assertEqual(get_many.call_count, 2)
+        self.assertEqual(get.call_count, 0)
+        for post, card in zip(posts, rendered):
+            self.assertIn(post.text, card)
+
+    def test_feed_renders_cards(self):
+        response = Client().get(reverse('posts:group_posts',
+                                        kwargs={'slug': 'test-slug'}))
+        self.assertContains(response, 'test text')
+        self.assertNotContains(response, cards.OWNER_LINKS)
@@ -0,0 +1,54 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class CommentsCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='test_user')
+        cls.post = Post.objects.create(text='test text', author=cls.user)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CommentsCountTests.user)
+
+    def comments_count(self):
+        return Post.objects.get(pk=CommentsCountTests.post.pk).comments_count
+
+    def test_views_keep_counter(self):
+        kwargs = {'username': 'test_user',
+                  'post_id': CommentsCountTests.post.pk}
+        self.authorized_client.post(reverse('posts:add_comment',
+                                            kwargs=kwargs),
+                                    {'text': 'comment'})
+        self.assertEqual(self.comments_count(), 1)
+        comment = Comment.objects.get()
+        self.authorized_client.get(reverse(
+            'posts:delete_comment',
+            kwargs={**kwargs, 'comment_id': comment.pk}
+        ))
+        self.assertEqual(self.comments_count(), 0)
+
+    def test_post_edit_keeps_counter(self):
+        post = Post.objects.get(pk=CommentsCountTests.post.pk)
+        Comment.objects.create(post=post, author=CommentsCountTests.user,
+                               text='comment')
+        post.text = 'edited text'
+        post.save()
+        self.assertEqual(self.comments_count(), 1)
+
+    def test_reconcile_command(self):
+        Comment.objects.create(post=CommentsCountTests.post,
+                               author=CommentsCountTests.user,
+                               text='comment')
+        Post.objects.update(comments_count=5)
+        call_command('reconcile_comment_counts', stdout=StringIO())
+        self.assertEqual(self.comments_count(), 1)
@@ -8,6 +8,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase
 from django.urls import reverse
 
+from posts.forms import PostForm
 from posts.models import Post
 
 User = get_user_model()
@@ -115,3 +116,21 @@ class PostFormTests(TestCase):
                     }))
         self.assertEqual(response.status_code, HTTPStatus.FOUND)
         self.assertEqual(Post.objects.count(), 1)
+
+    def test_post_form_rejects_duplicate(self):
+        form = PostForm(data={'text': 'test text'})
+        with self.assertNumQueries(1) as context:
+            self.assertFalse(form.is_valid())
+        self.assertIn('content_hash', context.captured_queries[0]['sql'])
+        self.assertEqual(form.errors['text'],
+                         ['Пост c таким содержанием, уже есть'])
+
+    def test_post_form_edit_keeps_own_content(self):
+        response = self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={
+                'username': 'test_user',
+                'post_id': PostFormTests.post.id
+            }),
+            data={'text': 'test text', 'discription': ''},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
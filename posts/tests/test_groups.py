@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts import groups
+from posts.models import Group, Post
+from templates.includes import context_processors
+
+User = get_user_model()
+
+
+class GroupListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='test_user')
+        cls.group = Group.objects.create(title='A group', slug='a-group')
+        cls.group2 = Group.objects.create(title='B group', slug='b-group')
+        Post.objects.create(text='post', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self):
+        return {group['slug']: group['post_count'] for group in groups.load()}
+
+    def test_list_is_cached(self):
+        self.assertEqual(self.counts(), {'a-group': 1, 'b-group': 0})
+        with self.assertNumQueries(0):
+            groups.load()
+
+    def test_moved_post_and_renamed_group_drop_cache(self):
+        groups.load()
+        post = Post.objects.get(group=GroupListTests.group)
+        post.group = GroupListTests.group2
+        post.save()
+        self.assertEqual(self.counts(), {'a-group': 0, 'b-group': 1})
+        group = Group.objects.get(pk=GroupListTests.group.pk)
+        group.title = 'Renamed'
+        group.save()
+        self.assertIn('Renamed',
+                      [group['title'] for group in groups.load()])
+
+    def test_invalidate_reaches_the_sidebar(self):
+        def sidebar():
+            return {group['slug']: group['post_count'] for group in
+                    context_processors.groups(None)['groups']}
+
+        self.assertEqual(sidebar(), {'a-group': 1, 'b-group': 0})
+        Post.objects.update(group=GroupListTests.group2)
+        groups.invalidate()
+        self.assertEqual(sidebar(), {'a-group': 0, 'b-group': 1})
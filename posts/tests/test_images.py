@@ -0,0 +1,153 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import images
+from posts.models import ImageVariant, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        buffer = BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(buffer, 'JPEG')
+        cls.user = User.objects.create(
+            username='test_user',
+            avatar=SimpleUploadedFile('avatar.jpg', buffer.getvalue(),
+                                      content_type='image/jpeg'),
+        )
+        cls.post = Post.objects.create(
+            text='test text', author=cls.user,
+            image=SimpleUploadedFile('big.jpg', buffer.getvalue(),
+                                     content_type='image/jpeg'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self):
+        return Template(
+            '{% load post_filters %}{% responsive_image post.image %}'
+        ).render(Context({'post': ImageVariantTests.post}))
+
+    def test_no_variants_renders_nothing(self):
+        self.assertEqual(self.render(), '')
+
+    def test_build_writes_variants_without_upscaling(self):
+        images.build(ImageVariantTests.post.image.name)
+        variants = ImageVariant.objects.filter(
+            source=ImageVariantTests.post.image.name
+        )
+        self.assertEqual(
+            sorted(set(variants.values_list('width', flat=True))),
+            [320, 640, 800],
+        )
+        self.assertTrue(variants.filter(mime_type='image/webp').exists())
+        self.assertEqual(variants.get(width=320, mime_type='image/jpeg')
+                         .height, 160)
+
+    def test_rebuild_deletes_the_old_files(self):
+        source = ImageVariantTests.post.image.name
+        images.build(source)
+        old = set(ImageVariant.objects.filter(source=source)
+                  .values_list('name', flat=True))
+        images.build(source)
+        new = set(ImageVariant.objects.filter(source=source)
+                  .values_list('name', flat=True))
+        self.assertFalse(old & new)
+        for name in old:
+            self.assertFalse(default_storage.exists(name))
+        for name in new:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_srcset_is_rendered(self):
+        images.build(ImageVariantTests.post.image.name)
+        html = self.render()
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('320w', html)
+        self.assertIn('800w', html)
+        response = self.client.get(reverse('posts:post', kwargs={
+            'username': 'test_user', 'post_id': ImageVariantTests.post.pk
+        }))
+        self.assertContains(response, '<picture>')
+
+    def test_prefetch_loads_many_images_in_one_query(self):
+        post, user = ImageVariantTests.post, ImageVariantTests.user
+        images.build(post.image.name)
+        with self.assertNumQueries(1):
+            images.prefetch([post.image, user.avatar])
+        with self.assertNumQueries(0):
+            self.assertIn('image/webp', images.variants(post.image))
+            self.assertEqual(images.variants(user.avatar), {})
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DiscardTests(TransactionTestCase):
+    """Variants are discarded on commit, which a TestCase never does."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='test_user',
+                                        avatar='avatars/test_user.jpg')
+
+    def upload(self, name):
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), 'blue').save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(),
+                                  content_type='image/jpeg')
+
+    def variant_files(self, source):
+        names = list(ImageVariant.objects.filter(source=source)
+                     .values_list('name', flat=True))
+        return [name for name in names if default_storage.exists(name)]
+
+    def test_replaced_image_loses_its_variants(self):
+        post = Post.objects.create(text='text', author=self.user,
+                                   image=self.upload('first.jpg'))
+        old = post.image.name
+        images.build(old)
+        files = self.variant_files(old)
+        self.assertTrue(files)
+        post.image = self.upload('second.jpg')
+        post.save()
+        self.assertFalse(ImageVariant.objects.filter(source=old).exists())
+        for name in files:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_deleted_post_loses_its_variants(self):
+        post = Post.objects.create(text='text', author=self.user,
+                                   image=self.upload('deleted.jpg'))
+        images.build(post.image.name)
+        files = self.variant_files(post.image.name)
+        post.delete()
+        self.assertFalse(ImageVariant.objects.exists())
+        for name in files:
+            self.assertFalse(default_storage.exists(name))
+        self.assertEqual(images.variants(post.image), {})
+
+    def test_text_edit_keeps_the_variants(self):
+        post = Post.objects.create(text='text', author=self.user,
+                                   image=self.upload('kept.jpg'))
+        images.build(post.image.name)
+        post.text = 'new text'
+        post.save()
+        self.assertTrue(self.variant_files(post.image.name))
@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.test import SimpleTestCase, TransactionTestCase
+
+from posts.management.commands.index_advisor import issues
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class IssuesTests(SimpleTestCase):
+    def test_scans_and_sorts_are_reported(self):
+        plan = ['SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY']
+        self.assertEqual(issues(plan), plan)
+
+    def test_index_reads_are_fine(self):
+        self.assertEqual(issues([
+            'SCAN posts_post USING INDEX post_pub_date_idx',
+            'SEARCH users_user USING INTEGER PRIMARY KEY (rowid=?)',
+        ]), [])
+
+    def test_ignored_tables(self):
+        self.assertEqual(issues([
+            'SCAN posts_group',
+            'SEARCH posts_post USING COVERING INDEX x (group_id=?)',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]), [])
+        self.assertEqual(issues([
+            'SEARCH posts_timeline USING INDEX x (user_id=?)',
+            'SEARCH posts_group USING INTEGER PRIMARY KEY (rowid=?)',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]), ['USE TEMP B-TREE FOR ORDER BY'])
+
+
+class IndexAdvisorTests(TransactionTestCase):
+    # The advisor replays the views on copies of the committed databases.
+    def setUp(self):
+        author = User.objects.create(username='author',
+                                     avatar='avatars/author.jpg')
+        reader = User.objects.create(username='reader',
+                                     avatar='avatars/reader.jpg')
+        Follow.objects.create(user=author, author=reader)
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(text='indexed post', author=author,
+                                   group=group)
+        Comment.objects.create(post=post, author=reader, text='comment')
+
+    def test_views_are_indexed(self):
+        output = StringIO()
+        call_command('index_advisor', '--check', stdout=output)
+        self.assertIn('0 queries to index', output.getvalue())
+
+    def test_missing_index_is_reported(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX comment_post_created_idx')
+        self.addCleanup(self.restore_index)
+        output = StringIO()
+        with self.assertRaisesMessage(CommandError, '1 queries to index'):
+            call_command('index_advisor', '--check', stdout=output)
+        self.assertIn('USE TEMP B-TREE FOR ORDER BY', output.getvalue())
+        self.assertIn('posts:post', output.getvalue())
+
+    def test_databases_are_left_untouched(self):
+        names = {alias: connections[alias].settings_dict['NAME']
+                 for alias in connections}
+        call_command('index_advisor', stdout=StringIO())
+        self.assertEqual(
+            {alias: connections[alias].settings_dict['NAME']
+             for alias in connections}, names,
+        )
+        # The replay logged the author in, on the copy only.
+        self.assertFalse(Session.objects.exists())
+        self.assertIsNone(User.objects.get(username='author').last_login)
+
+    def restore_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE INDEX comment_post_created_idx '
+                           'ON posts_comment (post_id, created)')
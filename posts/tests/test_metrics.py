@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts import metrics
+
+
+def _in_child(amount):
+    metrics.inc('cache_requests_total', amount, cache='child', result='hit')
+    metrics.inc('http_requests_in_flight', 5)
+    metrics.flush()
+
+
+@override_settings(INTERNAL_IPS=['127.0.0.1'])
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_requests_are_measured(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{status="200",'
+            'view="posts:index",le="+Inf"}', text
+        )
+        self.assertIn('db_queries_total{view="posts:index"}', text)
+        self.assertIn('cache_requests_total{cache="page",result="miss"}',
+                      text)
+
+    def test_only_internal_ips_may_scrape(self):
+        for internal in (['10.0.0.1'], []):
+            with self.subTest(internal=internal), \
+                    override_settings(INTERNAL_IPS=internal):
+                response = self.client.get(reverse('metrics'))
+                self.assertEqual(response.status_code, 404)
+
+
+class MultiProcessTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        location = os.path.join(directory.name, 'metrics.sqlite3')
+        overrides = override_settings(METRICS_LOCATION=location)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def run_child(self, amount):
+        child = multiprocessing.get_context('fork').Process(
+            target=_in_child, args=(amount,)
+        )
+        child.start()
+        child.join()
+        self.assertEqual(child.exitcode, 0)
+
+    def test_counters_are_summed_and_gauges_of_dead_workers_dropped(self):
+        self.run_child(2)
+        self.run_child(3)
+        families = metrics.collect()
+        counters = families['cache_requests_total']
+        labels = (('cache', 'child'), ('result', 'hit'))
+        self.assertEqual(counters[('cache_requests_total', labels)], 5)
+        in_flight = families.get('http_requests_in_flight', {})
+        self.assertLess(sum(in_flight.values()), 5)
+
+    def test_exited_workers_are_folded_into_one_snapshot(self):
+        for amount in (2, 3, 4):
+            self.run_child(amount)
+            metrics.collect()
+        labels = (('cache', 'child'), ('result', 'hit'))
+        counters = metrics.collect()['cache_requests_total']
+        self.assertEqual(counters[('cache_requests_total', labels)], 9)
+        connection = sqlite3.connect(settings.METRICS_LOCATION)
+        self.addCleanup(connection.close)
+        processes = {process for process, in connection.execute(
+            'SELECT DISTINCT process FROM metrics'
+        )}
+        self.assertEqual(len(processes), 2)
+        self.assertIn(metrics.RETIRED, processes)
+        self.assertFalse(connection.execute(
+            "SELECT 1 FROM metrics WHERE process = ? "
+            "AND family = 'http_requests_in_flight'", (metrics.RETIRED,)
+        ).fetchone())
@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from posts.models import Comment, Follow, Group, Post
+from posts.models import Comment, Follow, Group, Post, content_hash
 
 User = get_user_model()
 
@@ -97,3 +97,11 @@ class ModelsTest(TestCase):
         }
         for value, expected in str_objects_names.items():
             self.assertEqual(value, expected)
+
+    def test_saving_only_the_text_updates_its_hash(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'новый текст поста'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.content_hash,
+                         content_hash('новый текст поста', post.discription))
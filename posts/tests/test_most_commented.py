@@ -0,0 +1,138 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import most_commented
+from posts.models import Comment, Post
+from templates.includes import context_processors
+
+User = get_user_model()
+
+
+class MostCommentedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='test_user')
+        cls.posts = [
+            Post.objects.create(text=f'post {number}', author=cls.user)
+            for number in range(8)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, times=1):
+        for _ in range(times):
+            Comment.objects.create(post=post, author=MostCommentedTests.user,
+                                   text='comment')
+
+    def test_top_follows_new_comments(self):
+        posts = MostCommentedTests.posts
+        self.comment(posts[0])
+        self.assertEqual(most_commented.load(), [posts[0]])
+        self.comment(posts[1], times=2)
+        self.assertEqual(most_commented.load(), [posts[1], posts[0]])
+
+    def test_top_is_updated_without_aggregation(self):
+        posts = MostCommentedTests.posts
+        self.comment(posts[0])
+        most_commented.load()
+        self.comment(posts[2], times=3)
+        with self.assertNumQueries(1):
+            self.assertEqual(most_commented.load(), [posts[2], posts[0]])
+
+    def test_deleted_comment_and_post_leave_top(self):
+        posts = MostCommentedTests.posts
+        self.comment(posts[0])
+        self.comment(posts[1], times=2)
+        most_commented.load()
+        Comment.objects.filter(post=posts[1]).delete()
+        self.assertEqual(most_commented.load(), [posts[0]])
+        Post.objects.get(pk=posts[0].pk).delete()
+        self.assertEqual(most_commented.load(), [])
+
+    def test_concurrent_updates_are_never_lost(self):
+        posts = MostCommentedTests.posts
+        self.comment(posts[0])
+        most_commented.load()
+        threads = [
+            threading.Thread(target=most_commented.update,
+                             args=(post.pk, 10 + number))
+            for number, post in enumerate(posts)
+        ]
+        read = cache.get
+
+        def slow_read(*args, **kwargs):
+            # Every writer reads before any of them writes back.
+            value = read(*args, **kwargs)
+            time.sleep(0.02)
+            return value
+
+        started = time.monotonic()
+        with mock.patch.object(cache, 'get', slow_read):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertLess(time.monotonic() - started, 1)
+        top = cache.get(most_commented.CACHE_KEY)
+        if top is not None:
+            self.assertEqual({pk for pk, count in top['entries']},
+                             {post.pk for post in posts})
+
+    def test_overlapping_writer_drops_the_top(self):
+        posts = MostCommentedTests.posts
+        self.comment(posts[0])
+        most_commented.load()
+        read = cache.get
+        overlapped = []
+
+        def read_then_overlap(key, *args, **kwargs):
+            value = read(key, *args, **kwargs)
+            if key == most_commented.CACHE_KEY and not overlapped:
+                overlapped.append(key)
+                most_commented.update(posts[1].pk, 5)
+            return value
+
+        with mock.patch.object(cache, 'get', read_then_overlap):
+            most_commented.update(posts[2].pk, 7)
+        self.assertIsNone(cache.get(most_commented.CACHE_KEY))
+
+    def test_rebuild_overlapping_a_writer_is_dropped(self):
+        posts = MostCommentedTests.posts
+        self.comment(posts[0])
+        scatter = Post.objects.scatter
+
+        def read_then_overlap(*args, **kwargs):
+            most_commented.update(posts[1].pk, 5)
+            return scatter(*args, **kwargs)
+
+        with mock.patch.object(Post.objects, 'scatter', read_then_overlap):
+            most_commented.rebuild()
+        self.assertIsNone(cache.get(most_commented.CACHE_KEY))
+
+    def test_sidebar_follows_the_top(self):
+        posts = MostCommentedTests.posts
+        self.comment(posts[0])
+
+        def sidebar():
+            return list(context_processors.most_commented(None)[
+                'most_commented'
+            ])
+
+        self.assertEqual(sidebar(), [posts[0]])
+        most_commented.update(posts[1].pk, 5)
+        self.assertEqual(sidebar(), [posts[1], posts[0]])
+
+    def test_widget_is_not_loaded_when_not_rendered(self):
+        with CaptureQueriesContext(connection) as context:
+            Client().get(reverse('login'))
+        for query in context.captured_queries:
+            self.assertNotIn('FROM "posts_post"', query['sql'])
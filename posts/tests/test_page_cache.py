@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Comment, Group, Post
+from posts.page_cache import HEADER
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10), 'red').save(buffer, 'JPEG')
+        cls.author = User.objects.create(
+            username='author',
+            avatar=SimpleUploadedFile('avatar.jpg', buffer.getvalue(),
+                                      content_type='image/jpeg'),
+        )
+        cls.other = User.objects.create(
+            username='other',
+            avatar=SimpleUploadedFile('other.jpg', buffer.getvalue(),
+                                      content_type='image/jpeg'),
+        )
+        cls.group = Group.objects.create(title='group', slug='group')
+        cls.post = Post.objects.create(text='cached post', author=cls.author,
+                                       group=cls.group)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.post_url = reverse('posts:post', kwargs={
+            'username': 'author', 'post_id': PageCacheTests.post.pk
+        })
+        self.profile_url = reverse('posts:profile',
+                                   kwargs={'username': 'author'})
+
+    def assertCached(self, url, hit=True):
+        response = self.client.get(url)
+        self.assertEqual(response.get(HEADER), 'hit' if hit else 'miss')
+        return response
+
+    def test_second_anonymous_get_is_a_hit(self):
+        self.assertCached(reverse('posts:index'), hit=False)
+        response = self.assertCached(reverse('posts:index'))
+        self.assertContains(response, 'cached post')
+
+    def test_logged_in_pages_are_not_cached(self):
+        self.client.force_login(PageCacheTests.other)
+        for _ in range(2):
+            response = self.client.get(reverse('posts:index'))
+            self.assertNotIn(HEADER, response)
+
+    def test_new_post_drops_only_its_pages(self):
+        other_url = reverse('posts:profile', kwargs={'username': 'other'})
+        for url in (reverse('posts:index'), self.profile_url, other_url):
+            self.client.get(url)
+        Post.objects.create(text='fresh post', author=PageCacheTests.author)
+        response = self.assertCached(reverse('posts:index'), hit=False)
+        self.assertContains(response, 'fresh post')
+        self.assertCached(self.profile_url, hit=False)
+        self.assertCached(other_url)
+
+    def test_deleted_post_is_not_served(self):
+        post = Post.objects.create(text='doomed post',
+                                   author=PageCacheTests.author)
+        self.assertContains(self.client.get(self.profile_url), 'doomed post')
+        post.delete()
+        self.assertNotContains(self.client.get(self.profile_url),
+                               'doomed post')
+
+    def test_comment_drops_post_page(self):
+        self.client.get(self.post_url)
+        Comment.objects.create(post=PageCacheTests.post,
+                               author=PageCacheTests.other,
+                               text='new comment')
+        response = self.assertCached(self.post_url, hit=False)
+        self.assertContains(response, 'new comment')
+
+    def test_group_edit_drops_every_page(self):
+        self.client.get(self.profile_url)
+        group = Group.objects.get(pk=PageCacheTests.group.pk)
+        group.title = 'renamed'
+        group.save()
+        self.assertCached(self.profile_url, hit=False)
+
+    def test_moved_post_drops_old_group_page(self):
+        url = reverse('posts:group_posts', kwargs={'slug': 'group'})
+        self.assertContains(self.client.get(url), 'cached post')
+        post = Post.objects.get(pk=PageCacheTests.post.pk)
+        post.group = None
+        post.save()
+        self.assertNotContains(self.client.get(url), 'cached post')
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.paginator import CursorPaginator, decode_cursor, encode_cursor
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='test_user')
+        for number in range(25):
+            Post.objects.create(text=f'test text {number}', author=cls.user)
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cursor_round_trip(self):
+        post = CursorPaginatorTests.ordered[0]
+        self.assertEqual(decode_cursor(encode_cursor(post)),
+                         (post.pub_date, post.pk))
+        self.assertIsNone(decode_cursor('broken'))
+
+    def test_walk_forward_and_back(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.get_page(1)
+        self.assertEqual(list(first), CursorPaginatorTests.ordered[:10])
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+
+        second = paginator.get_page(2, after=paginator.next_cursor)
+        self.assertEqual(list(second), CursorPaginatorTests.ordered[10:20])
+        third = paginator.get_page(3, after=paginator.next_cursor)
+        self.assertEqual(list(third), CursorPaginatorTests.ordered[20:])
+        self.assertFalse(third.has_next())
+
+        back = paginator.get_page(2, before=paginator.previous_cursor)
+        self.assertEqual(list(back), CursorPaginatorTests.ordered[10:20])
+        self.assertTrue(back.has_previous())
+
+    def test_cursor_page_skips_count_and_offset(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        paginator.get_page(1)
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as context:
+            self.guest_client.get(url, paginator.page_params(2))
+        sql = context.captured_queries[0]['sql']
+        self.assertIn('LIMIT 11', sql)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import profiling
+
+PROFILING_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILING_DIR=PROFILING_DIR, PROFILING_RING_SIZE=2)
+class ProfilingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        for path in profiling.dumps():
+            os.remove(path)
+
+    def get(self, **headers):
+        return self.client.get(reverse('posts:index'), **headers)
+
+    def test_unsigned_requests_are_not_profiled(self):
+        response = self.get(HTTP_X_PROFILE='profile:forged')
+        self.assertNotIn('X-Profile-Dump', response)
+        self.assertEqual(profiling.dumps(), [])
+
+    def test_signed_header_writes_a_dump(self):
+        response = self.get(HTTP_X_PROFILE=profiling.token())
+        paths = profiling.dumps('posts:index')
+        self.assertEqual([os.path.basename(path) for path in paths],
+                         [response['X-Profile-Dump']])
+        output = StringIO()
+        call_command('profile_report', '--sort', 'cumulative',
+                     stdout=output)
+        self.assertIn('posts:index: 1 requests', output.getvalue())
+        self.assertIn('render', output.getvalue())
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_ring_keeps_the_newest_dumps(self):
+        names = [self.get()['X-Profile-Dump'] for _ in range(3)]
+        self.assertEqual(
+            [os.path.basename(path) for path in profiling.dumps()],
+            names[1:],
+        )
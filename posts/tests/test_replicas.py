@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from posts import replicas
+from posts.management.commands.sync_replicas import Command
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class RouterTests(SimpleTestCase):
+    def test_reads_go_to_the_replica_only_when_asked(self):
+        self.assertEqual(router.db_for_read(Post), 'default')
+        with replicas.use_replica():
+            self.assertEqual(router.db_for_read(Post), 'replica1')
+            self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_pinned_reader_stays_on_the_primary(self):
+        seen = []
+
+        @replicas.replica_reads
+        def view(request):
+            seen.append(router.db_for_read(Post))
+            return HttpResponse()
+
+        factory = RequestFactory()
+        view(factory.get('/'))
+        pinned = factory.get('/')
+        pinned.COOKIES[replicas.PIN_COOKIE] = '1'
+        view(pinned)
+        self.assertEqual(seen, ['replica1', 'default'])
+
+    def test_asking_where_to_write_does_not_pin(self):
+        def view(request):
+            router.db_for_write(Post)
+            return HttpResponse()
+
+        middleware = replicas.ReplicaPinMiddleware(view)
+        response = middleware(RequestFactory().get('/'))
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+
+class ReadYourWritesTests(TransactionTestCase):
+    """A replica copied from the test database, reads checked per alias."""
+
+    alias = 'replica_test'
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.author = User.objects.create(username='author',
+                                          avatar='avatars/author.jpg')
+        self.reader = User.objects.create(username='reader',
+                                          avatar='avatars/reader.jpg')
+        self.post = Post.objects.create(text='replicated post',
+                                        author=self.author)
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        Command().copy(connections['default'], path)
+        connections.databases[self.alias] = {
+            'ENGINE': 'twitter_killer.sqlite',
+            'NAME': path,
+            'OPTIONS': {
+                'pragmas': {'journal_mode': None, 'query_only': 'ON'},
+            },
+        }
+        self.addCleanup(self.forget)
+        overrides = override_settings(DATABASE_REPLICAS=[self.alias])
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def forget(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+        del connections.databases[self.alias]
+
+    def read(self, client):
+        """The post page and the aliases that read posts for it."""
+        served = set()
+
+        def watch(alias):
+            def wrapper(execute, sql, params, many, context):
+                if 'FROM "posts_post"' in sql:
+                    served.add(alias)
+                return execute(sql, params, many, context)
+            return wrapper
+
+        with connections['default'].execute_wrapper(watch('default')), \
+                connections[self.alias].execute_wrapper(watch(self.alias)):
+            response = client.get(reverse(
+                'posts:post', args=['author', self.post.pk]
+            ))
+        return response, served
+
+    def test_writer_reads_the_primary_until_replicas_catch_up(self):
+        self.client.force_login(self.reader)
+        response, served = self.read(self.client)
+        self.assertEqual(served, {self.alias})
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+        self.client.post(
+            reverse('posts:add_comment', args=['author', self.post.pk]),
+            {'text': 'fresh comment'},
+        )
+        response, served = self.read(self.client)
+        self.assertEqual(served, {'default'})
+        self.assertContains(response, 'fresh comment')
+
+        # Another browser of the same user is pinned too, anyone else
+        # still reads the replica, which has not seen the comment.
+        other_browser = Client()
+        other_browser.force_login(self.reader)
+        response, served = self.read(other_browser)
+        self.assertEqual(served, {'default'})
+        response, served = self.read(Client())
+        self.assertEqual(served, {self.alias})
+        self.assertNotContains(response, 'fresh comment')
+
+
+class SyncTests(SimpleTestCase):
+    def test_copy_is_swapped_in_whole(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        alias = 'sync_replicas_test'
+        connections.databases[alias] = {
+            'ENGINE': 'twitter_killer.sqlite',
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+        }
+
+        def forget():
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+        self.addCleanup(forget)
+        with connections[alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE post (text TEXT)')
+            cursor.execute("INSERT INTO post VALUES ('replicated')")
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        Command().copy(connections[alias], path)
+        Command().copy(connections[alias], path)
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute('PRAGMA journal_mode').fetchone()[0], 'delete'
+        )
+        self.assertEqual(replica.execute('SELECT text FROM post').fetchall(),
+                         [('replicated',)])
+        self.assertNotIn('replica.sqlite3.partial',
+                         os.listdir(directory.name))
@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='test_user')
+        cls.in_text = Post.objects.create(
+            text='Пост про котиков и собак', author=cls.user
+        )
+        cls.in_title = Post.objects.create(
+            text='Просто текст', discription='Котики', author=cls.user
+        )
+        cls.other = Post.objects.create(text='Про погоду', author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query):
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': query})
+        return list(response.context['page'].object_list)
+
+    def test_search_ranks_and_matches_prefix(self):
+        self.assertEqual(self.search('котик'),
+                         [SearchTests.in_title, SearchTests.in_text])
+
+    def test_search_without_query(self):
+        response = self.guest_client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.get(pk=SearchTests.other.pk)
+        post.text = 'Про котиков в погоду'
+        post.save()
+        self.assertIn(post, self.search('котиков'))
+        Post.objects.get(pk=SearchTests.in_text.pk).delete()
+        self.assertEqual(self.search('собак'), [])
+
+    def test_every_match_is_paginated(self):
+        Post.objects.bulk_create(
+            Post(text=f'Ещё котик {number}', author=SearchTests.user)
+            for number in range(12)
+        )
+        call_command('reindex_search', stdout=StringIO())
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': 'котик', 'page': 2})
+        page = response.context['page']
+        self.assertEqual(page.paginator.count, 14)
+        self.assertEqual(len(page.object_list), 4)
+        first = self.search('котик')
+        self.assertEqual(len(set(first) | set(page.object_list)), 14)
+
+    def test_reindex_command(self):
+        call_command('reindex_search', stdout=StringIO())
+        self.assertEqual(self.search('погоду'), [SearchTests.other])
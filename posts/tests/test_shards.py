@@ -0,0 +1,225 @@
+import tempfile
+import threading
+from contextlib import ExitStack
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, router
+from django.db.backends.signals import connection_created
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import shards
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ShardTests(TestCase):
+    """Two SQLite files as shards, users and groups in the test database."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.shards = ['shard_test_0', 'shard_test_1']
+        for alias in cls.shards:
+            connections.databases[alias] = {
+                'ENGINE': 'twitter_killer.sqlite',
+                'NAME': f'{cls.directory.name}/{alias}.sqlite3',
+                'OPTIONS': {'pragmas': {'foreign_keys': 'OFF'}},
+            }
+        cls.sharded = override_settings(POST_SHARDS=cls.shards)
+        cls.sharded.enable()
+        for alias in cls.shards:
+            call_command('migrate', database=alias, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        shards.shutdown()
+        cls.sharded.disable()
+        for alias in cls.shards:
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(self.empty_shards)
+        # Consecutive ids, so the authors alternate between the shards.
+        self.authors = [
+            User.objects.create(username=f'author{number}',
+                                avatar=f'avatars/{number}.jpg')
+            for number in range(4)
+        ]
+        self.group = Group.objects.create(title='Группа', slug='group')
+
+    def empty_shards(self):
+        for alias in self.shards:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('DELETE FROM posts_comment')
+                cursor.execute('DELETE FROM posts_post')
+
+    def shard_of(self, author):
+        return shards.for_author(author.pk)
+
+    def other_shard(self, author):
+        return next(alias for alias in self.shards
+                    if alias != self.shard_of(author))
+
+    def write_posts(self, count):
+        return [
+            Post.objects.create(text=f'post {number}', group=self.group,
+                                author=self.authors[number % 4])
+            for number in range(count)
+        ]
+
+    def test_posts_and_comments_live_on_the_shard_of_the_author(self):
+        author, reader = self.authors[:2]
+        post = Post.objects.create(text='sharded', author=author)
+        shard = self.shard_of(author)
+        self.assertTrue(Post.objects.using(shard).filter(pk=post.pk).exists())
+        self.assertFalse(Post.objects.using('default').exists())
+        self.assertEqual(post.pk >> shards.ID_BITS, self.shards.index(shard))
+
+        self.client.force_login(reader)
+        self.client.post(
+            reverse('posts:add_comment', args=[author.username, post.pk]),
+            {'text': 'comment'},
+        )
+        comment = Comment.objects.using(shard).get()
+        self.assertEqual(comment.post_id, post.pk)
+        post = Post.objects.using(shard).get(pk=post.pk)
+        self.assertEqual(post.comments_count, 1)
+
+        self.client.force_login(author)
+        self.client.get(
+            reverse('posts:post_delete', args=[author.username, post.pk])
+        )
+        self.assertFalse(Post.objects.using(shard).exists())
+        self.assertFalse(Comment.objects.using(shard).exists())
+
+    def test_feeds_merge_the_shards_newest_first(self):
+        posts = self.write_posts(12)[::-1]
+        response = self.client.get(reverse('posts:index'))
+        page = response.context['page']
+        self.assertEqual(list(page), posts[:10])
+        self.assertEqual(page[0].author, posts[0].author)
+        response = self.client.get(reverse('posts:index'), {
+            'page': 2, 'after': page.paginator.next_cursor,
+        })
+        self.assertEqual(list(response.context['page']), posts[10:])
+
+        response = self.client.get(
+            reverse('posts:group_posts', args=[self.group.slug])
+        )
+        self.assertEqual(list(response.context['page']), posts[:10])
+        self.assertEqual(list(Post.objects.scatter().reverse()[:3]),
+                         posts[::-1][:3])
+
+    def test_author_pages_read_a_single_shard(self):
+        author = self.authors[0]
+        post = self.write_posts(4)[0]
+        other = connections[self.other_shard(author)]
+        with CaptureQueriesContext(other) as queries:
+            response = self.client.get(
+                reverse('posts:profile', args=[author.username])
+            )
+            self.assertEqual(list(response.context['page']), [post])
+            self.assertEqual(response.context['count'], 1)
+            response = self.client.get(
+                reverse('posts:post', args=[author.username, post.pk])
+            )
+            self.assertEqual(response.context['post'], post)
+        self.assertEqual(len(queries), 0)
+
+    def test_follow_feed_asks_only_the_shards_of_followed_authors(self):
+        reader, author = self.authors[1], self.authors[2]
+        Follow.objects.create(user=reader, author=author)
+        posts = self.write_posts(8)
+        self.client.force_login(reader)
+        with CaptureQueriesContext(
+                connections[self.other_shard(author)]) as queries:
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page']),
+                         [posts[6], posts[2]])
+        self.assertEqual(len(queries), 0)
+
+    def test_pool_threads_keep_their_shard_connections(self):
+        self.write_posts(4)
+        opened = []
+
+        def connected(connection, **kwargs):
+            opened.append((threading.get_ident(), connection.alias))
+
+        connection_created.connect(connected)
+        self.addCleanup(connection_created.disconnect, connected)
+        for _ in range(5):
+            list(Post.objects.scatter()[:2])
+        self.assertEqual(len(opened), len(set(opened)))
+        shards.shutdown()
+        self.assertIsNone(shards._executor)
+        count = len(opened)
+        self.assertEqual(len(list(Post.objects.scatter()[:2])), 2)
+        self.assertEqual(len(opened), count + len(self.shards))
+
+    def test_pool_threads_run_the_wrappers_of_the_caller(self):
+        self.write_posts(4)
+        seen = []
+
+        def record(execute, sql, params, many, context):
+            seen.append((threading.get_ident(), context['connection'].alias))
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for alias in self.shards:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(record)
+                )
+            list(Post.objects.scatter()[:2])
+        self.assertEqual(sorted(alias for _, alias in seen), self.shards)
+        self.assertNotIn(threading.get_ident(),
+                         [thread for thread, _ in seen])
+        list(Post.objects.scatter()[:2])
+        self.assertEqual(len(seen), len(self.shards))
+
+    def test_deleting_a_user_reaches_the_shards(self):
+        author, reader = self.authors[:2]
+        gone = Post.objects.create(text='gone', author=author)
+        kept = Post.objects.create(text='kept', author=reader)
+        Comment.objects.create(post=kept, author=author, text='gone')
+        Comment.objects.create(post=kept, author=reader, text='kept')
+        Comment.objects.create(post=gone, author=reader, text='gone')
+        User.objects.get(pk=author.pk).delete()
+        self.assertEqual(list(Post.objects.scatter()), [kept])
+        comments = Comment.objects.using(self.shard_of(reader))
+        self.assertEqual([comment.text for comment in comments], ['kept'])
+        self.assertFalse(
+            Comment.objects.using(self.shard_of(author)).exists()
+        )
+        kept = Post.objects.using(self.shard_of(reader)).get(pk=kept.pk)
+        self.assertEqual(kept.comments_count, 1)
+
+    def test_deleting_a_group_ungroups_the_sharded_posts(self):
+        posts = self.write_posts(2)
+        Group.objects.get(pk=self.group.pk).delete()
+        for post in posts:
+            post = Post.objects.using(self.shard_of(post.author)).get(
+                pk=post.pk
+            )
+            self.assertIsNone(post.group_id)
+
+    def test_only_posts_are_migrated_to_the_shards(self):
+        shard = self.shards[0]
+        self.assertTrue(router.allow_migrate(shard, 'posts',
+                                             model_name='post'))
+        self.assertFalse(router.allow_migrate(shard, 'posts',
+                                              model_name='group'))
+        self.assertFalse(router.allow_migrate(shard, 'users',
+                                              model_name='user'))
+        self.assertTrue(router.allow_migrate('default', 'posts',
+                                             model_name='post'))
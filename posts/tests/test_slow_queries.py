@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts import slow_queries
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_literals_and_in_lists_are_collapsed(self):
+        self.assertEqual(
+            slow_queries.normalize(
+                "SELECT *  FROM t\n WHERE a IN (%s, %s, %s) "
+                "AND b = 'x''y' LIMIT 21"
+            ),
+            'SELECT * FROM t WHERE a IN (...) AND b = ? LIMIT ?',
+        )
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        Post.objects.create(author=author, text='followed post')
+        self.client.force_login(self.user)
+
+    def entries(self):
+        with self.assertLogs('posts.slow_queries', 'WARNING') as logs:
+            self.client.get(reverse('posts:follow_index'))
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_queries_are_attributed_and_explained(self):
+        entries = self.entries()
+        feed = [entry for entry in entries
+                if 'posts_post' in entry['sql'] and entry['plan']]
+        self.assertTrue(feed)
+        self.assertTrue(any(
+            entry['site'] and entry['site'].startswith('posts/')
+            for entry in feed
+        ))
+        self.assertTrue(any(entry['template'] for entry in entries))
+
+    def test_command_ranks_the_offenders(self):
+        entries = self.entries()
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as log:
+            for entry in entries + entries:
+                log.write(json.dumps(entry) + '\n')
+        output = StringIO()
+        call_command('slow_queries', '--file', path, '--sort', 'count',
+                     stdout=output)
+        self.assertIn(entries[0]['sql'], output.getvalue())
+        self.assertIn('from posts/', output.getvalue())
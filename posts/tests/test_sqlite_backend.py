@@ -0,0 +1,89 @@
+import os
+import re
+import tempfile
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class TestDatabaseTests(TestCase):
+    def test_suite_runs_in_production_mode(self):
+        self.assertFalse(connection.is_in_memory_db())
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class FileDatabaseTests(SimpleTestCase):
+    def use(self, options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        alias = 'sqlite_backend_test'
+        connections.databases[alias] = {
+            'ENGINE': 'twitter_killer.sqlite',
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+            'OPTIONS': options,
+        }
+
+        def forget():
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+        self.addCleanup(forget)
+        return alias
+
+    def test_stock_unless_production(self):
+        alias = self.use({})
+        with connections[alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'delete')
+        self.assertEqual(connections[alias].transaction_mode, 'DEFERRED')
+
+    def test_wal_and_immediate_transactions(self):
+        alias = self.use({'production': True,
+                          'pragmas': {'cache_size': -1000}})
+        with connections[alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -1000)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        with CaptureQueriesContext(connections[alias]) as queries:
+            with transaction.atomic(using=alias):
+                with connections[alias].cursor() as cursor:
+                    cursor.execute('INSERT INTO item DEFAULT VALUES')
+        self.assertEqual(queries.captured_queries[0]['sql'],
+                         'BEGIN IMMEDIATE')
+
+    def test_unknown_transaction_mode(self):
+        alias = self.use({'transaction_mode': 'LAZY'})
+        with self.assertRaises(ImproperlyConfigured):
+            connections[alias].ensure_connection()
+
+
+class StressTests(SimpleTestCase):
+    def test_immediate_against_deferred(self):
+        output = StringIO()
+        call_command('sqlite_stress', '--seconds', '0.5', '--writers', '4',
+                     '--readers', '2', '--posts', '50', stdout=output)
+        rows = {
+            mode: (int(writes), int(locked))
+            for mode, writes, locked in re.findall(
+                r'^(\w+)\s+(\d+)\s+\d+\s+(\d+)', output.getvalue(),
+                re.MULTILINE,
+            )
+        }
+        deferred_writes, deferred_locked = rows['deferred']
+        immediate_writes, immediate_locked = rows['immediate']
+        # Deferred transactions fail under concurrent add_comment,
+        # immediate ones queue without losing the throughput.
+        self.assertGreater(deferred_locked, 0)
+        self.assertEqual(immediate_locked, 0)
+        self.assertGreater(immediate_writes, deferred_writes / 2)
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.models import KVStore
+
+from posts import thumbnails
+from posts.models import ImageVariant, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'JPEG')
+        cls.user = User.objects.create(
+            username='test_user',
+            avatar=SimpleUploadedFile('avatar.jpg', buffer.getvalue(),
+                                      content_type='image/jpeg'),
+        )
+        cls.post = Post.objects.create(
+            text='test text', author=cls.user,
+            image=SimpleUploadedFile('small.jpg', buffer.getvalue(),
+                                     content_type='image/jpeg'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def post_page(self):
+        return self.client.get(reverse('posts:post', kwargs={
+            'username': 'test_user', 'post_id': ThumbnailTests.post.pk
+        }))
+
+    def test_request_serves_placeholder_and_queues(self):
+        queued = len(connection.run_on_commit)
+        response = self.post_page()
+        self.assertContains(response,
+                            f'<img src="{static(thumbnails.PLACEHOLDER)}"/>')
+        self.assertEqual(len(connection.run_on_commit), queued + 1)
+
+    def test_generated_thumbnails_are_served(self):
+        thumbnails.generate(ThumbnailTests.post.image.name,
+                            thumbnails.POST_GEOMETRIES)
+        for geometry, options in thumbnails.POST_GEOMETRIES:
+            thumbnail = default.backend.get_existing(
+                ThumbnailTests.post.image, geometry, **options
+            )
+            self.assertIsNotNone(thumbnail)
+        response = self.post_page()
+        self.assertContains(response, f'<img src="{thumbnail.url}"/>')
+
+    def warm(self):
+        out = StringIO()
+        call_command('warm_thumbnails', workers=1, stdout=out)
+        return out.getvalue()
+
+    def test_warm_command_writes_only_missing_thumbnails_and_variants(self):
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'cache'),
+                      ignore_errors=True)
+        output = self.warm()
+        self.assertIn('1 images, 2 thumbnails created', output)
+        self.assertIn('2 images given variants', output)
+        self.assertTrue(ImageVariant.objects.filter(
+            source=ThumbnailTests.user.avatar.name
+        ).exists())
+        for geometry, options in thumbnails.POST_GEOMETRIES:
+            thumbnail = default.backend.get_existing(
+                ThumbnailTests.post.image, geometry, **options
+            )
+            self.assertTrue(thumbnail.exists())
+        self.assertFalse(KVStore.objects.filter(
+            value__contains=ThumbnailTests.user.avatar.name
+        ).exists())
+
+        output = self.warm()
+        self.assertIn('0 thumbnails created', output)
+        self.assertIn('0 images given variants', output)
+        # Files still there, only their entries are registered again.
+        KVStore.objects.all().delete()
+        cache.clear()
+        self.assertIn('0 thumbnails created', self.warm())
+        geometry, options = thumbnails.POST_GEOMETRIES[0]
+        self.assertIsNotNone(default.backend.get_existing(
+            ThumbnailTests.post.image, geometry, **options
+        ))
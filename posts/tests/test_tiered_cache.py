@@ -0,0 +1,117 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from posts import tiered_cache
+from posts.models import Post
+from posts.paginator import CursorPaginator
+
+User = get_user_model()
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        tiered_cache.clear_local()
+        self.calls = 0
+
+    def compute(self, value='value', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_local_tier_answers_without_shared_cache(self):
+        self.assertEqual(tiered_cache.fetch('key', self.compute(), 60),
+                         'value')
+        cache.clear()
+        self.assertEqual(tiered_cache.fetch('key', self.compute(), 60),
+                         'value')
+        self.assertEqual(self.calls, 1)
+
+    def test_shared_tier_fills_local_tier(self):
+        tiered_cache.fetch('key', self.compute(), 60)
+        tiered_cache.clear_local()
+        tiered_cache.fetch('key', self.compute(), 60)
+        self.assertEqual(self.calls, 1)
+
+    def test_concurrent_misses_compute_once(self):
+        compute = self.compute(delay=0.1)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                tiered_cache.fetch('key', compute, 60)
+            ))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_is_served_while_refreshing(self):
+        cache.set('key', ('old', time.time() - 1, time.time() + 59), 60)
+        cache.add('key:lock', 1, 60)
+        self.assertEqual(tiered_cache.fetch('key', self.compute(), 60),
+                         'old')
+        self.assertEqual(self.calls, 0)
+        cache.delete('key:lock')
+        self.assertEqual(tiered_cache.fetch('key', self.compute(), 60),
+                         'value')
+
+    def test_waits_for_value_of_other_process(self):
+        cache.add('key:lock', 1, 60)
+        timer = threading.Timer(
+            0.1, lambda: cache.set(
+                'key', ('other', time.time() + 60, time.time() + 120), 120
+            )
+        )
+        timer.start()
+        self.assertEqual(tiered_cache.fetch('key', self.compute(), 60),
+                         'other')
+        timer.join()
+        self.assertEqual(self.calls, 0)
+
+    def test_local_value_past_its_stale_time_is_not_served(self):
+        tiered_cache.fetch('key', self.compute('old'), 0.05, stale=0.05)
+        time.sleep(0.1)
+        cache.clear()
+        cache.add('key:lock', 1, 60)
+        with override_settings(TIERED_CACHE_LOCK_TIMEOUT=0.1):
+            self.assertEqual(
+                tiered_cache.fetch('key', self.compute('new'), 60), 'new'
+            )
+
+    @override_settings(TIERED_CACHE_LOCK_TIMEOUT=0.1)
+    def test_computes_when_other_process_never_answers(self):
+        cache.add('key:lock', 1, 60)
+        self.assertEqual(tiered_cache.fetch('key', self.compute(), 60),
+                         'value')
+
+
+class CachedFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='test_user')
+        for number in range(15):
+            Post.objects.create(text=f'test text {number}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        tiered_cache.clear_local()
+
+    def test_cached_page_keeps_paginator_state(self):
+        first = CursorPaginator(Post.objects.all(), 10, cache_key='feed')
+        page = first.get_page(1)
+        second = CursorPaginator(Post.objects.all(), 10, cache_key='feed')
+        with self.assertNumQueries(0):
+            cached = second.get_page(1)
+            self.assertEqual(list(cached), list(page))
+        self.assertTrue(cached.has_next())
+        self.assertEqual(second.next_cursor, first.next_cursor)
@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts import timeline
+from posts.models import Follow, Post, Timeline
+from posts.paginator import CursorPaginator
+
+User = get_user_model()
+
+
+@override_settings(TIMELINE_LENGTH=3)
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.other = User.objects.create(username='other')
+
+    def timeline(self):
+        return list(
+            Timeline.objects.filter(user=TimelineTests.reader)
+            .values_list('post_id', flat=True)
+        )
+
+    def test_new_post_is_pushed_to_followers(self):
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        post = Post.objects.create(text='pushed',
+                                   author=TimelineTests.author)
+        Post.objects.create(text='not pushed', author=TimelineTests.other)
+        self.assertEqual(self.timeline(), [post.pk])
+
+    def test_timeline_is_capped(self):
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        posts = [
+            Post.objects.create(text=f'post {number}',
+                                author=TimelineTests.author)
+            for number in range(5)
+        ]
+        self.assertEqual(self.timeline(),
+                         [post.pk for post in reversed(posts[-3:])])
+
+    def test_trimming_all_followers_takes_one_query(self):
+        readers = [User.objects.create(username=f'reader{number}')
+                   for number in range(5)]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=TimelineTests.author)
+        posts = [Post.objects.create(text=f'post {number}',
+                                     author=TimelineTests.author)
+                 for number in range(3)]
+        with CaptureQueriesContext(connection) as context:
+            newest = Post.objects.create(text='newest',
+                                         author=TimelineTests.author)
+        trims = [query for query in context.captured_queries
+                 if query['sql'].startswith('DELETE FROM posts_timeline')]
+        self.assertEqual(len(trims), 1)
+        expected = [newest.pk, posts[2].pk, posts[1].pk]
+        for reader in readers:
+            self.assertEqual(
+                list(Timeline.objects.filter(user=reader)
+                     .values_list('post_id', flat=True)),
+                expected,
+            )
+
+    def test_follow_backfills_and_unfollow_drops(self):
+        post = Post.objects.create(text='old post',
+                                   author=TimelineTests.author)
+        follow = Follow.objects.create(user=TimelineTests.reader,
+                                       author=TimelineTests.author)
+        self.assertEqual(self.timeline(), [post.pk])
+        follow.delete()
+        self.assertEqual(self.timeline(), [])
+
+    def test_trim_keeps_what_the_feed_shows_first(self):
+        posts = [Post.objects.create(text=f'post {number}',
+                                     author=TimelineTests.other)
+                 for number in range(5)]
+        now = timezone.now()
+        # Entry ids run against post ids, the two tie-breaks disagree.
+        for post in reversed(posts):
+            Timeline.objects.create(user=TimelineTests.reader, post=post,
+                                    pub_date=now)
+        page = CursorPaginator(
+            Timeline.objects.filter(user=TimelineTests.reader), 3
+        ).get_page(1)
+        shown = [entry.post_id for entry in page]
+        timeline.trim(TimelineTests.reader.pk)
+        self.assertCountEqual(self.timeline(), shown)
+
+    def test_unfollow_reads_both_usernames_at_once(self):
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        follow = Follow.objects.get(user=TimelineTests.reader)
+        with CaptureQueriesContext(connection) as context:
+            follow.delete()
+        users = [query for query in context.captured_queries
+                 if 'FROM "users_user"' in query['sql']]
+        self.assertEqual(len(users), 1)
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        post = Post.objects.create(text='post', author=TimelineTests.author)
+        Timeline.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline(), [post.pk])
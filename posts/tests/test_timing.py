@@ -0,0 +1,58 @@
+import json
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts import timing
+from posts.models import Group
+
+
+def _server_timing(response):
+    durations = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, duration = entry.split(';dur=')
+        durations[name] = float(duration)
+    return durations
+
+
+class TimerTests(SimpleTestCase):
+    def test_nested_phases_are_exclusive(self):
+        timer = timing.Timer()
+        timer.start('outer')
+        time.sleep(0.02)
+        timer.start('inner')
+        time.sleep(0.02)
+        timer.stop()
+        timer.stop()
+        self.assertGreaterEqual(timer.phases['inner'], 0.02)
+        self.assertGreaterEqual(timer.phases['outer'], 0.02)
+        self.assertLess(timer.phases['outer'], 0.035)
+
+    def test_phase_outside_of_a_request_does_nothing(self):
+        with timing.phase('db'):
+            self.assertIsNone(timing.current())
+
+
+class TimingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Group.objects.create(title='test group', slug='test_group')
+
+    def test_server_timing_splits_the_request(self):
+        with self.assertLogs('posts.timing', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        durations = _server_timing(response)
+        for name in ('resolve', 'view', 'db', 'template', 'context.year',
+                     'context.groups', 'total'):
+            self.assertIn(name, durations)
+        phases = sum(value for name, value in durations.items()
+                     if name != 'total')
+        self.assertLessEqual(phases, durations['total'] + 0.5)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(set(record['phases_ms']),
+                         set(durations) - {'total'})
@@ -115,6 +115,7 @@ class PostsViewsTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(PostsViewsTests.user)
@@ -216,17 +217,31 @@ class PostsViewsTests(TestCase):
         self.assertNotIn(PostsViewsTests.post3,
                          response.context.get('page').object_list)
 
-    def test_home_page_cache(self):
-        response = self.authorized_client.get(reverse('posts:index'))
-        first_content = response.content
+    def test_home_page_shows_a_new_post_at_once(self):
+        self.authorized_client.get(reverse('posts:index'))
         Post.objects.create(text='test_cache', author=PostsViewsTests.user)
-        response2 = self.authorized_client.get(reverse('posts:index'))
-        cashed_content = response2.content
-        self.assertEqual(first_content, cashed_content)
-        cache.clear()
-        response3 = self.authorized_client.get(reverse('posts:index'))
-        uncashed_content = response3.content
-        self.assertNotEqual(first_content, uncashed_content)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'test_cache')
+
+    def test_home_page_owner_links_and_deletes_are_per_reader(self):
+        reader = User.objects.create(username='reader',
+                                     avatar='avatars/reader.jpg')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        post = Post.objects.create(text='owned post',
+                                   author=PostsViewsTests.user)
+        edit = reverse('posts:post_edit', args=['test_user', post.pk])
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')), edit
+        )
+        response = reader_client.get(reverse('posts:index'))
+        self.assertContains(response, 'owned post')
+        self.assertNotContains(response, edit)
+        self.authorized_client.get(
+            reverse('posts:post_delete', args=['test_user', post.pk])
+        )
+        response = reader_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'owned post')
 
 
 class FollowViewsTests(TestCase):
@@ -281,6 +296,22 @@ class FollowViewsTests(TestCase):
             ).exists()
         )
 
+    def test_profile_shows_whether_the_reader_follows(self):
+        cache.clear()
+        User.objects.filter(pk=FollowViewsTests.user.pk).update(
+            avatar='avatars/test_user.jpg'
+        )
+        url = reverse('posts:profile', kwargs={'username': 'test_user'})
+        response = self.authorized_client2.get(url)
+        self.assertFalse(response.context['following'])
+        Follow.objects.create(user=FollowViewsTests.user2,
+                              author=FollowViewsTests.user)
+        response = self.authorized_client2.get(url)
+        self.assertTrue(response.context['following'])
+        for client in (self.authorized_client, self.authorized_client3,
+                       Client()):
+            self.assertFalse(client.get(url).context['following'])
+
     def test_follower_see_new_post_of_following(self):
         Follow.objects.create(user=FollowViewsTests.user2,
                               author=FollowViewsTests.user)
@@ -0,0 +1,231 @@
+"""Thumbnail generation off the request thread.
+
+``ThumbnailBackend`` replaces the sorl backend: ``{% thumbnail %}`` only
+returns thumbnails that already exist and queues the missing ones on a
+local thread pool, showing a placeholder until they are ready. Uploads
+queue every geometry the templates use right after the post is saved.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.templatetags.static import static
+from sorl.thumbnail import base, default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import metrics, page_cache
+from .timing import timed
+
+logger = logging.getLogger(__name__)
+
+# Geometries and options exactly as the templates pass them to
+# {% thumbnail %}, anything else would produce another file name.
+POST_GEOMETRIES = (
+    ('900x360', {'upscale': True}),
+    ('960x500', {'upscale': True}),
+)
+PLACEHOLDER = 'images/slide_panel_foto.jpg'
+
+_local = threading.local()
+_lock = threading.Lock()
+_queued = set()
+_futures = set()
+_executor = None
+
+
+class PlaceholderImageFile(DummyImageFile):
+    @property
+    def url(self):
+        return static(PLACEHOLDER)
+
+
+def pending_count():
+    """Placeholders served by this thread, lets caches skip them."""
+    return getattr(_local, 'pending', 0)
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """sorl backend that never resizes images on the request thread."""
+
+    def _options(self, source, options):
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """The thumbnail file, whether it was written or not."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._options(source, options)
+        )
+        return ImageFile(name, default.storage)
+
+    def get_existing(self, file_, geometry_string, **options):
+        """Thumbnail known to the key value store or ``None``."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+    def existing_key(self, file_, geometry_string, **options):
+        """Key value store key ``get_existing`` looks the thumbnail up by."""
+        return add_prefix(
+            self.thumbnail_file(file_, geometry_string, **options).key
+        )
+
+    @timed('thumbnails')
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if getattr(_local, 'generating', False) or not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        thumbnail = self.get_existing(file_, geometry_string, **options)
+        if thumbnail is not None:
+            return thumbnail
+        enqueue(ImageFile(file_).name, [(geometry_string, options)])
+        _local.pending = pending_count() + 1
+        return PlaceholderImageFile(geometry_string)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def generate(name, geometries):
+    """Create the missing thumbnails of one image, run by the workers.
+
+    Thumbnails whose file was wiped from the storage are created again,
+    a file the key value store lost is only registered again. Returns
+    how many thumbnail files were written.
+    """
+    created = 0
+    changed = False
+    _local.generating = True
+    try:
+        for geometry_string, options in geometries:
+            try:
+                thumbnail = default.backend.thumbnail_file(
+                    name, geometry_string, **options
+                )
+                existing = default.kvstore.get(thumbnail)
+                if existing is not None and existing.exists():
+                    continue
+                if existing is not None:
+                    default.kvstore.delete(existing)
+                written = not thumbnail.exists()
+                started = time.perf_counter()
+                default.backend.get_thumbnail(
+                    name, geometry_string, **options
+                )
+                changed = True
+                if written:
+                    metrics.observe('thumbnail_generation_seconds',
+                                    time.perf_counter() - started)
+                    metrics.inc('thumbnails_generated_total')
+                    created += 1
+            except Exception:
+                logger.exception('Thumbnail %s of %s failed',
+                                 geometry_string, name)
+            finally:
+                with _lock:
+                    _queued.discard((name, geometry_string))
+        if changed:
+            page_cache.image_changed(name)
+    finally:
+        _local.generating = False
+    return created
+
+
+def _run(function, *args):
+    try:
+        return function(*args)
+    finally:
+        # The worker thread outlives the job, its connection must not.
+        connection.close()
+
+
+def submit(function, *args):
+    """Run ``function`` on the image worker pool."""
+    future = _get_executor().submit(_run, function, *args)
+    with _lock:
+        _futures.add(future)
+    future.add_done_callback(_futures.discard)
+
+
+def _submit(name, geometries):
+    with _lock:
+        geometries = [
+            (geometry_string, options)
+            for geometry_string, options in geometries
+            if (name, geometry_string) not in _queued
+        ]
+        _queued.update(
+            (name, geometry_string) for geometry_string, _ in geometries
+        )
+    if geometries:
+        submit(generate, name, geometries)
+
+
+def enqueue(name, geometries):
+    """Queue thumbnails of an image once the current transaction commits."""
+    transaction.on_commit(lambda: _submit(name, list(geometries)))
+
+
+def join():
+    """Block until every queued thumbnail is written."""
+    with _lock:
+        futures = list(_futures)
+    wait(futures)
+
+
+@timed('thumbnails')
+def prefetch(names, geometries=POST_GEOMETRIES):
+    """Look the thumbnails of many images up with one query.
+
+    Fills the cache of the cached database key value store, so the
+    ``{% thumbnail %}`` tags that follow do not query one by one.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return
+    keys = {
+        default.backend.existing_key(name, geometry_string, **options)
+        for name in names if name
+        for geometry_string, options in geometries
+    }
+    missing = set(keys) - set(kvstore.cache.get_many(keys))
+    if not missing:
+        return
+    found = dict(KVStoreModel.objects.filter(key__in=missing).values_list(
+        'key', 'value'
+    ))
+    kvstore.cache.set_many(
+        {key: found.get(key, cached_db_kvstore.EMPTY_VALUE)
+         for key in missing},
+        sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+    )
+
+
+def pregenerate(image):
+    """Queue every template geometry of a freshly uploaded image."""
+    if image:
+        enqueue(image.name, POST_GEOMETRIES)
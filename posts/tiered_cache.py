@@ -0,0 +1,129 @@
+"""Two-tier read-through cache with stampede protection.
+
+``fetch`` looks a key up in a small in-process LRU first and in the
+shared cache second. A missing value is computed by one caller only:
+threads of a process wait for the one already computing it, other
+processes see the lock entry in the shared cache and wait for the value
+to appear. A value past its freshness is still served for ``stale``
+seconds to everybody but the single caller refreshing it, and never
+after that, from either tier.
+
+The in-process tier can not be reached by invalidation from other
+workers, so keys have to carry the versions of what they depend on
+(see ``page_cache.versions``); a write then changes the key instead of
+deleting the value.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+_flights = {}
+_MISSING = object()
+POLL_INTERVAL = 0.05
+
+
+def _local_get(key):
+    with _local_lock:
+        entry = _local.get(key)
+        if entry is not None:
+            _local.move_to_end(key)
+        return entry
+
+
+def _local_set(key, entry):
+    with _local_lock:
+        _local[key] = entry
+        _local.move_to_end(key)
+        while len(_local) > settings.TIERED_CACHE_LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def clear_local():
+    with _local_lock:
+        _local.clear()
+
+
+def _lookup(key):
+    """``(value, fresh_until, stale_until)`` from the nearest tier or
+    ``None``."""
+    now = time.time()
+    entry = _local_get(key)
+    if entry is not None and entry[1] > now:
+        metrics.inc('cache_requests_total', cache='local', result='hit')
+        return entry
+    metrics.inc('cache_requests_total', cache='local', result='miss')
+    shared = cache.get(key)
+    metrics.inc('cache_requests_total', cache='shared',
+                result='miss' if shared is None else 'hit')
+    if shared is not None:
+        _local_set(key, shared)
+        return shared
+    if entry is not None and entry[2] > now:
+        return entry
+    return None
+
+
+def _store(key, value, timeout, stale):
+    now = time.time()
+    entry = (value, now + timeout, now + timeout + stale)
+    cache.set(key, entry, timeout + stale)
+    _local_set(key, entry)
+    return value
+
+
+def _wait_shared(key):
+    """Value another process is computing, ``_MISSING`` on timeout."""
+    deadline = time.monotonic() + settings.TIERED_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            _local_set(key, entry)
+            return entry[0]
+    return _MISSING
+
+
+def fetch(key, compute, timeout, stale=None):
+    """Value of ``key``, calling ``compute()`` once when it is missing."""
+    if stale is None:
+        stale = settings.TIERED_CACHE_STALE
+    entry = _lookup(key)
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+    with _local_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = threading.Event()
+    if not leader:
+        if entry is not None:
+            return entry[0]
+        flight.wait(settings.TIERED_CACHE_LOCK_TIMEOUT)
+        entry = _lookup(key)
+        if entry is not None:
+            return entry[0]
+        return _store(key, compute(), timeout, stale)
+    lock_key = f'{key}:lock'
+    try:
+        if cache.add(lock_key, 1, settings.TIERED_CACHE_LOCK_TIMEOUT):
+            try:
+                return _store(key, compute(), timeout, stale)
+            finally:
+                cache.delete(lock_key)
+        if entry is not None:
+            return entry[0]
+        value = _wait_shared(key)
+        if value is _MISSING:
+            value = _store(key, compute(), timeout, stale)
+        return value
+    finally:
+        with _local_lock:
+            del _flights[key]
+        flight.set()
@@ -0,0 +1,86 @@
+"""Fan-out-on-write follow feeds.
+
+Every reader keeps a materialized list of the latest posts of the authors
+they follow in ``Timeline``, capped at ``settings.TIMELINE_LENGTH`` entries,
+so ``follow_index`` reads one indexed range instead of joining
+``Post``, ``User`` and ``Follow``. A new post trims the timelines of all
+followers of its author with one statement.
+"""
+from django.conf import settings
+from django.db import connections, router
+
+from .models import Follow, Post, Timeline
+
+
+def _entries(user_id, posts):
+    return [
+        Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts
+    ]
+
+
+def _trim(users_sql, params):
+    """Drop the entries beyond ``TIMELINE_LENGTH`` of the timelines of
+    the users ``users_sql`` selects, in the ``(-pub_date, -pk)`` order
+    ``CursorPaginator`` pages them in."""
+    table = Timeline._meta.db_table
+    with connections[router.db_for_write(Timeline)].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            'SELECT id FROM ('
+            'SELECT id, ROW_NUMBER() OVER ('
+            'PARTITION BY user_id ORDER BY pub_date DESC, id DESC'
+            f') AS position FROM {table} WHERE user_id IN ({users_sql})'
+            ') AS ranked WHERE position > %s)',
+            [*params, settings.TIMELINE_LENGTH],
+        )
+
+
+def trim(user_id):
+    """Drop the entries of a timeline beyond ``TIMELINE_LENGTH``."""
+    _trim('%s', [user_id])
+
+
+def push(post):
+    """Put a new post into the timelines of all followers of its author."""
+    followers = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    Timeline.objects.bulk_create(
+        [Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers],
+        ignore_conflicts=True,
+    )
+    _trim(*followers.query.sql_with_params())
+
+
+def backfill(user_id, author_id):
+    """Copy the latest posts of a freshly followed author."""
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-pk')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    )
+    Timeline.objects.bulk_create(
+        _entries(user_id, posts), ignore_conflicts=True
+    )
+    trim(user_id)
+
+
+def drop(user_id, author_id):
+    """Remove the posts of an unfollowed author."""
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_id):
+    """Build a timeline from scratch out of the current follows."""
+    Timeline.objects.filter(user_id=user_id).delete()
+    posts = (
+        Post.objects.filter(author__following__user_id=user_id)
+        .order_by('-pub_date', '-pk')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    )
+    Timeline.objects.bulk_create(_entries(user_id, posts))
@@ -0,0 +1,156 @@
+"""Where the time of every request goes, per phase.
+
+``TimingMiddleware`` splits each request into phases: url resolve and
+request middleware, the view body, database queries, template
+rendering, each sidebar context processor and thumbnail lookups. Phases
+are exclusive, a phase counts its own time without the phases nested
+inside it, so together they add up to the total. The result is sent in
+a ``Server-Timing`` header and logged as one JSON line to the
+``posts.timing`` logger.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class Timer:
+    def __init__(self):
+        self.phases = {}
+        self.queries = 0
+        self._open = []
+
+    def start(self, name):
+        self._open.append([name, time.perf_counter(), 0.0])
+
+    def stop(self):
+        name, started, nested = self._open.pop()
+        elapsed = time.perf_counter() - started
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed - nested
+        if self._open:
+            self._open[-1][2] += elapsed
+
+    def stop_all(self):
+        while self._open:
+            self.stop()
+
+
+def current():
+    """``Timer`` of the request this thread serves, or ``None``."""
+    return getattr(_local, 'timer', None)
+
+
+@contextmanager
+def phase(name):
+    """Count the enclosed time to ``name``, when a request is timed."""
+    timer = current()
+    if timer is None:
+        yield
+        return
+    timer.start(name)
+    try:
+        yield
+    finally:
+        timer.stop()
+
+
+def timed(name):
+    """Decorator running every call of the function in ``phase(name)``."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Database:
+    """Execute wrapper counting the queries of one request, also those
+    the shard pool threads run for it."""
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.thread = threading.get_ident()
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.timer.queries += 1
+        if threading.get_ident() != self.thread:
+            # The request thread waits for it in a db phase of its own.
+            return execute(sql, params, many, context)
+        with phase('db'):
+            return execute(sql, params, many, context)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with phase('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Django template backend that times rendering."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except django_backend.TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class TimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = request.timing = _local.timer = Timer()
+        started = time.perf_counter()
+        timer.start('resolve')
+        try:
+            with ExitStack() as stack:
+                database = _Database(timer)
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(database)
+                    )
+                response = self.get_response(request)
+        finally:
+            timer.stop_all()
+            _local.timer = None
+        total = time.perf_counter() - started
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.1f}'
+            for name, seconds in [*timer.phases.items(), ('total', total)]
+        )
+        match = getattr(request, 'resolver_match', None)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': timer.queries,
+            'total_ms': round(total * 1000, 2),
+            'phases_ms': {name: round(seconds * 1000, 2)
+                          for name, seconds in timer.phases.items()},
+        }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = current()
+        if timer is not None:
+            timer.stop()
+            timer.start('view')
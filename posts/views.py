@@ -1,24 +1,88 @@
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import (BooleanField, Count, Exists, IntegerField,
+                              OuterRef, Subquery, Value)
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import images
+from . import search as post_search
+from . import shards, thumbnails
 from .forms import CommentForm, PostForm, ProfileEditForm
-from .models import Comment, Follow, Group, Post, User
+from .models import Follow, Group, Post, Timeline, User
+from .page_cache import cache_anonymous, versioned_key
+from .paginator import CursorPaginator
+from .query_budget import query_budget
+from .replicas import replica_reads
 
 
-def pages(request, value):
-    paginator = Paginator(value, 10)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def _count(model, field):
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(total=Count('pk')).values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def authors():
+    """Users with the post and follow counts the profile header shows.
+
+    Sharded posts are out of reach of a subquery, ``get_author`` counts
+    them on the shard instead.
+    """
+    users = User.objects.annotate(
+        follower_total=_count(Follow, 'user'),
+        following_total=_count(Follow, 'author'),
+    )
+    if shards.enabled():
+        return users
+    return users.annotate(posts_total=_count(Post, 'author'))
+
+
+def get_author(username, reader=None):
+    """The author with the header counts and, as ``followed``, whether
+    ``reader`` follows them, in a single query."""
+    followed = Value(False, output_field=BooleanField())
+    if reader is not None and reader.is_authenticated:
+        followed = Exists(Follow.objects.filter(user=reader,
+                                                author=OuterRef('pk')))
+    author = get_object_or_404(authors().annotate(followed=followed),
+                               username=username)
+    if shards.enabled():
+        author.posts_total = author.posts.count()
+    return author
+
+
+def get_post(username, post_id):
+    """The post of ``username``, read from the shard of its author."""
+    author = get_object_or_404(User, username=username)
+    post = get_object_or_404(author.posts, pk=post_id)
+    post.author = author
+    return post
+
+
+def pages(request, value, scope=None):
+    cache_key = None
+    if scope is not None:
+        cache_key = versioned_key(f'posts:feed:{scope}', scope)
+    paginator = CursorPaginator(value, 10, cache_key=cache_key)
+    return paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
 
 
+@query_budget(7)
+@replica_reads
+@cache_anonymous('feed')
 def index(request):
     latest = (
-        Post.objects.
-        select_related('author', 'group').
-        prefetch_related('comments').all()
+        Post.objects.scatter().
+        select_related('author', 'group').all()
     )
-    page = pages(request, latest)
+    page = pages(request, latest, 'feed')
     return render(request, 'index.html', {'page': page})
 
 
@@ -29,25 +93,32 @@ def new_post(request):
         new_post = form.save(commit=False)
         new_post.author = request.user
         new_post.save()
+        thumbnails.pregenerate(new_post.image)
+        images.queue(new_post.image)
         return redirect('posts:index')
     return render(request, 'new.html', {'form': form})
 
 
+@query_budget(8)
+@replica_reads
 def search(request):
-    query = request.GET.get("q")
-    post_matching = Post.objects.filter(text__icontains=query)
-    page = pages(request, post_matching)
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(post_search.ranked_ids(query), 10)
+    page = paginator.get_page(request.GET.get('page'))
+    page.object_list = post_search.load(page.object_list)
     return render(request, 'search_new.html', {'page': page, 'value': query})
 
 
+@query_budget(8)
+@replica_reads
+@cache_anonymous('group:{slug}')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = (
-        group.posts.
-        select_related('author').
-        prefetch_related('comments').all()[:12]
+        Post.objects.scatter().filter(group=group).
+        select_related('author', 'group').all()
     )
-    page = pages(request, posts)
+    page = pages(request, posts, f'group:{slug}')
     context = {
         'group': group,
         'page': page
@@ -55,30 +126,20 @@ def group_posts(request, slug):
     return render(request, 'group.html', context)
 
 
+@query_budget(8)
+@replica_reads
+@cache_anonymous('author:{username}')
 def profile(request, username):
-    author = get_object_or_404(
-        User.objects.
-        prefetch_related('posts', 'follower', 'following'),
-        username=username
-    )
+    author = get_author(username, reader=request.user)
     author_posts = (
         author.posts.
-        select_related('group').
-        prefetch_related('comments').all()
-    )
-    posts_count = author_posts.count()
-    following = (
-        request.user.is_authenticated
-        and request.user != author
-        and Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
+        select_related('group').all()
     )
-    page = pages(request, author_posts)
+    following = author.followed and request.user != author
+    page = pages(request, author_posts, f'author:{username}')
     context = {
         'author': author,
-        'count': posts_count,
+        'count': author.posts_total,
         'page': page,
         'following': following
     }
@@ -93,14 +154,22 @@ def profile_edit(request, username):
     form = ProfileEditForm(
         request.POST or None, files=request.FILES or None, instance=author)
     if form.is_valid():
-        form.save()
+        author = form.save()
+        if 'avatar' in form.changed_data:
+            images.queue(author.avatar)
         return redirect('posts:profile', form.cleaned_data['username'])
     return render(request, 'profile_edit.html', {'form': form})
 
 
+@query_budget(8)
+@replica_reads
+@cache_anonymous('author:{username}', 'post:{post_id}')
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
-    author = post.author
+    author = get_author(username)
+    post = get_object_or_404(author.posts.select_related('group'),
+                             pk=post_id)
+    post.author = author
+    images.prefetch([post.image, author.avatar])
     form = CommentForm()
     comments = (
         post.comments.select_related('author').all()
@@ -116,20 +185,23 @@ def post_view(request, username, post_id):
 
 @login_required
 def post_edit(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
+    post = get_post(username, post_id)
     if request.user != post.author:
         return redirect('posts:post', username, post_id)
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.pregenerate(post.image)
+            images.queue(post.image)
         return redirect('posts:post', username, post_id)
     return render(request, 'new.html', {'form': form, 'post': post})
 
 
 @login_required
 def delete_post(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
+    post = get_post(username, post_id)
     if request.user != post.author:
         return redirect('posts:post', username, post_id)
     post.delete()
@@ -138,20 +210,22 @@ def delete_post(request, username, post_id):
 
 @login_required
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
+    post = get_post(username, post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         new_comment = form.save(commit=False)
         new_comment.author = request.user
         new_comment.post = post
-        new_comment.save()
+        with transaction.atomic(using=post._state.db):
+            new_comment.save()
     return redirect('posts:post', username, post_id)
 
 
 @login_required
 def edit_comment(request, username, post_id, comment_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
-    author = post.author
+    author = get_author(username)
+    post = get_object_or_404(author.posts, pk=post_id)
+    post.author = author
     comment = post.comments.get(id=comment_id)
     if request.user != comment.author:
         return redirect('posts:post', username, post_id)
@@ -174,23 +248,33 @@ def edit_comment(request, username, post_id, comment_id):
 
 @login_required
 def delete_comment(request, username, post_id, comment_id):
-    comment = get_object_or_404(
-        Comment, post__id=post_id, id=comment_id
-    )
+    post = get_post(username, post_id)
+    comment = get_object_or_404(post.comments, id=comment_id)
     if request.user != comment.author:
         return redirect('posts:post', username, post_id)
-    comment.delete()
+    with transaction.atomic(using=comment._state.db):
+        comment.delete()
     return redirect('posts:post', username, post_id)
 
 
+@query_budget(8)
 @login_required
+@replica_reads
 def follow_index(request):
-    posts = (Post.objects.select_related('author').
-             select_related('group').
-             prefetch_related('comments').filter(
-             author__following__user=request.user
-             ))
-    page = pages(request, posts)
+    if shards.enabled():
+        followed = Follow.objects.filter(
+            user=request.user
+        ).values_list('author_id', flat=True)
+        posts = Post.objects.scatter(authors=followed)
+        page = pages(request, posts.select_related('author', 'group'))
+    else:
+        # Paged in the order of the timeline index, sorting the joined
+        # posts instead would take a temporary B-tree.
+        entries = Timeline.objects.filter(user=request.user).select_related(
+            'post__author', 'post__group'
+        )
+        page = pages(request, entries)
+        page.object_list = [entry.post for entry in page.object_list]
     return render(request, 'follow.html', {'page': page})
 
 
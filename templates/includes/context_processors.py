@@ -1,9 +1,14 @@
 import datetime as dt
 
-from django.db.models.aggregates import Count
-from posts.models import Group, Post
+from django.utils.functional import SimpleLazyObject
+from posts import groups as group_list
+from posts import most_commented as top
+from posts import tiered_cache
+from posts.page_cache import versioned_key
+from posts.timing import timed
 
 
+@timed('context.year')
 def year(request):
     """Add variable with the current year."""
     year = dt.date.today().year
@@ -11,18 +16,20 @@ def year(request):
 
 
 def groups(request):
-    """Set of groups"""
-    groups = Group.objects.prefetch_related('posts', ).all()
-    return {'groups': groups}
+    """Set of groups with their post counts, cached between requests"""
+    @timed('context.groups')
+    def load():
+        return group_list.load()
+    return {'groups': SimpleLazyObject(load)}
 
 
 def most_commented(request):
-    """Set of most commented posts"""
-    most_commented = (
-        Post.objects
-        .select_related('author', 'group')
-        .prefetch_related('comments')
-        .annotate(count_comments=Count('comments'))
-        .order_by("-count_comments")[:5]
-    )
-    return {'most_commented': most_commented}
+    """Set of most commented posts, loaded only if a template uses it"""
+    @timed('context.most_commented')
+    def load():
+        return tiered_cache.fetch(
+            versioned_key('posts:sidebar_most_commented', top.SCOPE),
+            top.load,
+            top.TIMEOUT,
+        )
+    return {'most_commented': SimpleLazyObject(load)}
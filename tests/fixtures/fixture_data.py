@@ -2,7 +2,8 @@ import tempfile
 
 import pytest
 from mixer.backend.django import mixer as _mixer
-from posts.models import Post, Group
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post
 
 
 @pytest.fixture()
@@ -10,6 +11,7 @@ def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
         settings.MEDIA_ROOT = temp_directory
         yield temp_directory
+        thumbnails.join()
 
 
 @pytest.fixture
@@ -39,3 +41,21 @@ def few_posts_with_group(mixer, user, group):
     """Return one record with the same author and group."""
     posts = mixer.cycle(20).blend(Post, author=user, group=group)
     return posts[0]
+
+
+@pytest.fixture
+def many_posts(mixer, user, group, django_user_model):
+    """Feeds several pages long with comments, groups and follows."""
+    author = django_user_model.objects.create_user(
+        username='ManyPostsAuthor', avatar=user.avatar, password='1234567'
+    )
+    posts = mixer.cycle(60).blend(
+        Post, author=mixer.sequence(user, author),
+        group=mixer.sequence(group, None), image='',
+    )
+    mixer.cycle(120).blend(
+        Comment, post=mixer.sequence(*posts[:20]),
+        author=mixer.sequence(user, author),
+    )
+    Follow.objects.create(user=user, author=author)
+    return posts[0]
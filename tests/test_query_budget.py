@@ -0,0 +1,53 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+from posts import tiered_cache
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture(autouse=True)
+def cold_cache():
+    cache.clear()
+    tiered_cache.clear_local()
+
+
+def feed_urls(post):
+    return [
+        reverse('posts:index'),
+        reverse('posts:index') + '?page=3',
+        reverse('posts:group_posts', kwargs={'slug': post.group.slug}),
+        reverse('posts:profile', kwargs={'username': post.author.username}),
+        reverse('posts:post', kwargs={
+            'username': post.author.username, 'post_id': post.pk
+        }),
+        reverse('posts:search') + '?q=' + post.text.split()[0],
+    ]
+
+
+class TestQueryBudget:
+    """Views stay within their ``@query_budget`` on a few pages of data.
+
+    Budgets themselves are enforced by ``posts.pytest_plugin``.
+    """
+
+    def test_guest_views(self, client, many_posts):
+        for url in feed_urls(many_posts):
+            response = client.get(url)
+            assert response.status_code == 200, (
+                f'Страница `{url}` работает неправильно'
+            )
+
+    def test_user_views(self, user_client, many_posts):
+        for url in feed_urls(many_posts) + [reverse('posts:follow_index')]:
+            response = user_client.get(url)
+            assert response.status_code == 200, (
+                f'Страница `{url}` работает неправильно'
+            )
+
+    def test_debug_headers(self, client, settings, many_posts):
+        settings.DEBUG = True
+        response = client.get(reverse('posts:index'))
+        assert int(response['X-Query-Count']) > 0
+        assert response['X-Query-Time'].endswith('ms')
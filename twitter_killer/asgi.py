@@ -0,0 +1,10 @@
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+from twitter_killer.handlers import ASGIHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'twitter_killer.settings')
+
+application = ASGIHandler(get_wsgi_application(), settings.ASGI_THREADS)
@@ -0,0 +1,312 @@
+"""Cache backend shared by every worker process through one SQLite file.
+
+Needs no external service: all processes of a deployment open the same
+database in WAL mode, so a value set or deleted by one worker is seen by
+the others at once. The store is bounded by ``MAX_ENTRIES`` and
+``MAX_BYTES`` and evicts the least recently read entries first. Reads
+only refresh the recency of an entry once per ``LRU_RESOLUTION``
+seconds, so hot keys do not turn every read into a write.
+Plain integers are stored as SQLite integers, which makes ``incr`` and
+``decr`` a single atomic ``UPDATE``; everything else is pickled.
+
+An empty ``LOCATION`` gives the process a private temporary file,
+shared by its threads.
+"""
+import atexit
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    # Running totals, so bounds are checked without scanning the table.
+    '''CREATE TABLE IF NOT EXISTS cache_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        entries INTEGER NOT NULL,
+        bytes INTEGER NOT NULL
+    )''',
+    'INSERT OR IGNORE INTO cache_stats VALUES (0, 0, 0)',
+    '''CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache
+    BEGIN
+        UPDATE cache_stats
+        SET entries = entries + 1, bytes = bytes + NEW.size;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache
+    BEGIN
+        UPDATE cache_stats
+        SET entries = entries - 1, bytes = bytes - OLD.size;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+    BEGIN
+        UPDATE cache_stats SET bytes = bytes - OLD.size + NEW.size;
+    END''',
+)
+UPSERT = '''
+    INSERT INTO cache (key, value, expires, accessed, size)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        value = excluded.value, expires = excluded.expires,
+        accessed = excluded.accessed, size = excluded.size
+'''
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+# SQLite refuses statements with more host parameters than this.
+BATCH_SIZE = 500
+
+
+def _encode(value):
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def _decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+_private_path = None
+_private_lock = threading.Lock()
+
+
+def _private_location():
+    """Temporary file shared by the threads of this process."""
+    global _private_path
+    with _private_lock:
+        if _private_path is None:
+            _private_path = _make_private_location()
+        return _private_path
+
+
+def _make_private_location():
+    fd, path = tempfile.mkstemp(prefix='twitter_killer-cache-',
+                                suffix='.sqlite3')
+    os.close(fd)
+    pid = os.getpid()
+
+    def remove():
+        if os.getpid() != pid:
+            return
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+    atexit.register(remove)
+    return path
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location or _private_location()
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 1))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    def _connection(self):
+        """Connection of this thread, opened again after a fork."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=self._busy_timeout,
+                isolation_level=None, check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            with self._write(connection):
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    @contextmanager
+    def _write(self, connection):
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _cull(self, connection, now):
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM cache_stats'
+        ).fetchone()
+        if entries <= self._max_entries and size <= self._max_bytes:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,)
+        )
+        while True:
+            entries, size = connection.execute(
+                'SELECT entries, bytes FROM cache_stats'
+            ).fetchone()
+            if entries <= self._max_entries and size <= self._max_bytes:
+                return
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),)
+            )
+
+    def _store(self, connection, items, timeout, now):
+        expires = self._expires(timeout)
+        rows = []
+        for key, value in items:
+            value, size = _encode(value)
+            rows.append((key, value, expires, now, size))
+        connection.executemany(UPSERT, rows)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        value, size = _encode(value)
+        now = time.time()
+        connection = self._connection()
+        with self._write(connection):
+            cursor = connection.execute(
+                UPSERT + ' WHERE cache.expires IS NOT NULL '
+                'AND cache.expires <= ?',
+                (key, value, self._expires(timeout), now, size, now)
+            )
+            added = cursor.rowcount > 0
+            if added:
+                self._cull(connection, now)
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        found = self._get_many([key])
+        return found[key] if key in found else default
+
+    def _get_many(self, keys):
+        now = time.time()
+        connection = self._connection()
+        found, stale = {}, []
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = keys[start:start + BATCH_SIZE]
+            rows = connection.execute(
+                'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(batch))}) '
+                f'AND {NOT_EXPIRED}',
+                (*batch, now)
+            )
+            for key, value, accessed in rows:
+                found[key] = _decode(value)
+                if now - accessed > self._lru_resolution:
+                    stale.append((now, key))
+        if stale:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale
+            )
+        return found
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = [(self._key(key, version), value)
+                 for key, value in data.items()]
+        now = time.time()
+        connection = self._connection()
+        with self._write(connection):
+            self._store(connection, items, timeout, now)
+            self._cull(connection, now)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._connection().execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {NOT_EXPIRED}',
+            (self._expires(timeout), key, now)
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._connection()
+        with self._write(connection):
+            connection.execute(
+                'UPDATE cache SET value = value + ? WHERE key = ? '
+                f"AND typeof(value) = 'integer' AND {NOT_EXPIRED}",
+                (delta, key, now)
+            )
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+                (key, now)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            if isinstance(row[0], int):
+                return row[0]
+            # Values that are not plain integers are added in Python.
+            value, size = _encode(_decode(row[0]) + delta)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (value, size, key)
+            )
+            return _decode(value)
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        cursor = self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (key,)
+        )
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        rows = [(self._key(key, version),) for key in keys]
+        connection = self._connection()
+        with self._write(connection):
+            connection.executemany('DELETE FROM cache WHERE key = ?', rows)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+            (key, time.time())
+        ).fetchone() is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        """Connections stay open between requests."""
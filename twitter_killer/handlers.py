@@ -0,0 +1,146 @@
+"""Django served by an ASGI server, without asgiref.
+
+Django 2.2 has neither an ASGI handler nor async views, its ORM only
+runs synchronously. ``ASGIHandler`` wraps the WSGI application instead:
+the request body is read and the response sent on the event loop, only
+the view runs in one of ``threads`` worker threads. A client uploading
+or downloading slowly holds a coroutine, not a thread, so a few threads
+serve many such clients.
+
+The response is built whole before it is sent, streamed responses are
+buffered, and a request body above ``MEMORY_BODY`` bytes spills to a
+temporary file.
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+MEMORY_BODY = 1024 * 1024
+
+
+class ASGIHandler:
+    def __init__(self, wsgi_application, threads):
+        self.wsgi_application = wsgi_application
+        self.threads = threads
+        self.executor = None
+        # A pool created before a fork has no threads in the child.
+        os.register_at_fork(after_in_child=self.forget)
+
+    def forget(self):
+        self.executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported ASGI scope {scope["type"]}')
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                self.threads, thread_name_prefix='asgi'
+            )
+        try:
+            status, headers, content = (
+                await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.run, environ(scope, body)
+                )
+            )
+        finally:
+            body.close()
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'),
+                         value.encode('latin-1'))
+                        for name, value in headers],
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.executor is not None:
+                    self.executor.shutdown()
+                    self.executor = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """The request body in a file, ``None`` if the client left."""
+        body = SpooledTemporaryFile(max_size=MEMORY_BODY)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    def run(self, environ):
+        """Call the WSGI application in a worker thread.
+
+        Closing the response there sends ``request_finished``, which
+        closes the database connections of the thread.
+        """
+        started = {}
+        chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            started.update(status=status, headers=headers)
+            return chunks.append
+
+        response = self.wsgi_application(environ, start_response)
+        try:
+            chunks.extend(response)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return started['status'], started['headers'], b''.join(chunks)
+
+
+def environ(scope, body):
+    """The WSGI environ of an ASGI HTTP ``scope``."""
+    root = scope.get('root_path', '')
+    path = scope['path']
+    if root and path.startswith(root):
+        path = path[len(root):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI carries the UTF-8 bytes of the path as latin-1.
+        'SCRIPT_NAME': root.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+        environ['REMOTE_PORT'] = str(scope['client'][1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{environ[name]}{separator}{value}'
+        environ[name] = value
+    return environ
@@ -37,7 +37,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.profiling.ProfilingMiddleware',
+    'posts.metrics.MetricsMiddleware',
+    'posts.timing.TimingMiddleware',
+    'posts.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.replicas.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,7 +57,7 @@ ROOT_URLCONF = 'twitter_killer.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'posts.timing.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -70,14 +75,58 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'twitter_killer.wsgi.application'
+# Threads running the views under twitter_killer.asgi, slow clients wait
+# on the event loop without holding one.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', '8'))
 
 
+# WAL, tuned pragmas and BEGIN IMMEDIATE for every SQLite database, see
+# twitter_killer.sqlite. Off leaves them as stock SQLite.
+SQLITE_PRODUCTION_MODE = os.getenv('SQLITE_PRODUCTION_MODE', '') == '1'
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'twitter_killer.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            'production': SQLITE_PRODUCTION_MODE,
+        },
     }
 }
+# Read-only copies of the primary, refreshed by manage.py sync_replicas.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        comma_separated_list(os.getenv('DATABASE_REPLICAS', '')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'twitter_killer.sqlite',
+        'NAME': path,
+        'OPTIONS': {
+            'production': SQLITE_PRODUCTION_MODE,
+            'pragmas': {'journal_mode': None, 'query_only': 'ON'},
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+# Posts and comments split by author, see posts.shards. A new shard is
+# created with manage.py migrate --database shardN.
+POST_SHARDS = []
+for number, path in enumerate(
+        comma_separated_list(os.getenv('POST_SHARDS', '')), 1):
+    DATABASES[f'shard{number}'] = {
+        'ENGINE': 'twitter_killer.sqlite',
+        'NAME': path,
+        'OPTIONS': {
+            'production': SQLITE_PRODUCTION_MODE,
+            # The users and groups the rows point at stay in default.
+            'pragmas': {'foreign_keys': 'OFF'},
+        },
+    }
+    POST_SHARDS.append(f'shard{number}')
+DATABASE_ROUTERS = [
+    'posts.shards.ShardRouter',
+    'posts.replicas.ReplicaRouter',
+]
+# Longer than the replicas take to catch up.
+REPLICA_PIN_SECONDS = 10
 
 
 AUTH_USER_MODEL = 'users.User'
@@ -112,9 +161,21 @@ LOGIN_REDIRECT_URL = "/"
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'twitter_killer.cache.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_BYTES': 256 * 1024 * 1024,
+        },
     }
 }
+# Shared by the worker processes, empty keeps metrics per process.
+METRICS_LOCATION = os.getenv(
+    'METRICS_LOCATION', os.path.join(BASE_DIR, 'metrics.sqlite3')
+)
+METRICS_FLUSH_INTERVAL = 1
 
 
 LANGUAGE_CODE = 'ru'
@@ -136,5 +197,66 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 
+TIMELINE_LENGTH = 500
+
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_WORKERS = 2
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+FEED_CACHE_TIMEOUT = 60 * 5
+TIERED_CACHE_LOCAL_SIZE = 1000
+TIERED_CACHE_STALE = 60
+TIERED_CACHE_LOCK_TIMEOUT = 10
+
+BENCHMARK_DIR = os.path.join(BASE_DIR, 'benchmarks')
+
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_RING_SIZE = 200
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG',
+                           os.path.join(BASE_DIR, 'slow_queries.log'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'timing': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 16 * 1024 * 1024,
+            'backupCount': 3,
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        # One JSON line per request, see posts.timing.
+        'posts.timing': {
+            'handlers': ['timing'],
+            'level': os.getenv('TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        # Read by manage.py slow_queries, see posts.slow_queries.
+        'posts.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+
 SHELL_PLUS = "ipython"
 SHELL_PLUS_PRINT_SQL = True
@@ -0,0 +1,25 @@
+"""Settings of the test suite.
+
+``python manage.py test --settings twitter_killer.settings_test``, pytest
+picks them up from pytest.ini.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, CACHES, DATABASES, LOGGING
+
+# The suite runs against a file in production mode as the site does,
+# in-memory SQLite shares one cache between connections and locks per
+# table instead.
+DATABASES['default']['OPTIONS']['production'] = True
+DATABASES['default']['TEST'] = {
+    'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+}
+
+# Every test run starts from a private empty cache and keeps its metrics
+# to itself.
+CACHES['default']['LOCATION'] = ''
+METRICS_LOCATION = ''
+
+LOGGING['loggers']['posts.timing']['level'] = 'WARNING'
+LOGGING['loggers']['posts.slow_queries']['level'] = 'CRITICAL'
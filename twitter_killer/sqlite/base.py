@@ -0,0 +1,76 @@
+"""SQLite backend for several worker processes writing at once.
+
+Three ``OPTIONS`` on top of the stock backend:
+
+``production``
+    off by default, the database then behaves as the stock backend
+    does. On, every new connection runs ``PRAGMAS``: WAL so readers
+    never wait for the writer, ``synchronous = NORMAL`` which is durable
+    enough under WAL, a busy timeout, a larger page cache and mmap
+    reads, and transactions begin ``IMMEDIATE``.
+``pragmas``
+    run on every new connection, merged over the production ones.
+    A pragma set to ``None`` is left at the SQLite default.
+    ``foreign_keys = OFF`` is kept through migrations and constraint
+    checks, for databases holding rows whose parents live elsewhere.
+``transaction_mode``
+    how ``atomic()`` begins its transaction, overriding the mode above.
+    A deferred transaction that reads before it writes, as every
+    ``add_comment`` does, holds a snapshot another writer can make stale,
+    and SQLite then fails it with "database is locked" without waiting.
+    ``BEGIN IMMEDIATE`` takes the write lock first, so writers queue on
+    the busy timeout one after another instead.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        production = params.pop('production', False)
+        self.pragmas = {**(PRAGMAS if production else {}),
+                        **params.pop('pragmas', {})}
+        mode = params.pop(
+            'transaction_mode', 'IMMEDIATE' if production else 'DEFERRED'
+        ).upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode must be one of {TRANSACTION_MODES}, '
+                f'not {mode!r}'
+            )
+        self.transaction_mode = mode
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if value is not None:
+                connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def checks_foreign_keys(self):
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        value = str(pragmas.get('foreign_keys', 'ON')).upper()
+        return value not in ('OFF', '0', 'FALSE', 'NO')
+
+    def enable_constraint_checking(self):
+        if self.checks_foreign_keys():
+            super().enable_constraint_checking()
+
+    def check_constraints(self, table_names=None):
+        if self.checks_foreign_keys():
+            super().check_constraints(table_names)
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -4,6 +4,7 @@ from django.conf.urls import handler404, handler500
 # from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
+from posts.metrics import metrics_view
 
 handler404 = 'posts.views.page_not_found'  # noqa
 handler500 = 'posts.views.server_error'  # noqa
@@ -14,6 +15,7 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # if settings.DEBUG: